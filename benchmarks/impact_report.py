@@ -0,0 +1,87 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.bm25_retriever import BM25Retriever
+from src.config_loader import AppConfig
+from src.ingestion import iter_passages
+from src.metrics import Evaluator
+from src.tokenized_corpus import TokenizedCorpus
+from src.utils import parse_judgments
+
+# Tuned parameters reported by pipeline.run.
+K1, B = 1.6, 1.0
+TOP_K = 5
+BITS = (8, 16)
+BUDGETS = (None, 2000, 1000, 500)
+REPEATS = 5
+
+
+def single_query_ms(model, queries):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        top_indices = [
+            model.retrieve_top_k(query_text, k=TOP_K) for query_text in queries
+        ]
+        best = min(best, time.perf_counter() - start)
+    return best * 1000 / len(queries), top_indices
+
+
+def main(config):
+    corpus = TokenizedCorpus.from_passages(iter_passages(config.test_passages_path))
+    questions = pd.read_json(config.test_questions_path)
+    queries = questions["query_text"].tolist()
+    evaluator = Evaluator(parse_judgments(config.test_judgments_path))
+
+    reference = BM25Retriever(config, k1=K1, b=B)
+    reference.fit(corpus)
+    reference_ms, reference_top = single_query_ms(reference, queries)
+    reference_results = evaluator.evaluate_model(reference, questions, corpus, k=TOP_K)
+
+    metrics = list(reference_results)
+    print(f"{len(corpus)} passages, {len(queries)} queries, k1={K1}, b={B}\n")
+    print(
+        f"{'index':<22}{'ms/query':>9}{'top-k overlap':>15}"
+        + "".join(f"{name:>10}" for name in metrics)
+    )
+    print(
+        f"{'float64 postings':<22}{reference_ms:>9.3f}{1:>15.3f}"
+        + "".join(f"{reference_results[name]:>10.4f}" for name in metrics)
+    )
+
+    for bits in BITS:
+        for budget in BUDGETS:
+            model = BM25Retriever(
+                config,
+                k1=K1,
+                b=B,
+                backend="impact",
+                impact_bits=bits,
+                impact_budget=budget,
+            )
+            model.fit(corpus)
+            ms, top = single_query_ms(model, queries)
+            overlap = np.mean(
+                [
+                    len(set(expected.tolist()) & set(found.tolist())) / TOP_K
+                    for expected, found in zip(reference_top, top)
+                ]
+            )
+            results = evaluator.evaluate_model(model, questions, corpus, k=TOP_K)
+
+            label = f"uint{bits}" + (f", {budget} postings" if budget else "")
+            print(
+                f"{label:<22}{ms:>9.3f}{overlap:>15.3f}"
+                + "".join(
+                    f"{results[name] - reference_results[name]:>+10.4f}"
+                    for name in metrics
+                )
+            )
+
+    print("\nquantized rows show the metric change against float64 BM25")
+
+
+if __name__ == "__main__":
+    main(AppConfig())
@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+MODULES = (
+    "src.tokenizer",
+    "src.utils",
+    "src.bm25_retriever",
+    "src.language_retriever",
+    "src.server",
+)
+REPEATS = 5
+
+
+def import_profile(module, cwd):
+    # ``-X importtime`` writes "self [us] | cumulative [us] | module" per
+    # imported module to stderr; a fresh interpreter per run keeps it cold.
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line[len("import time:") :].split("|")
+        if total.strip().isdigit():
+            cumulative[name.strip()] = int(total)
+    return cumulative, None
+
+
+def tokenize_from(cwd, query="What is the capital of France?"):
+    # The stopwords and config paths must resolve from any working directory.
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"from src.utils import tokenize_query; print(tokenize_query({query!r}))",
+        ],
+        cwd=cwd,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    return result.stdout.strip(), None
+
+
+def measure(module, cwd):
+    best, heaviest = None, []
+    for _ in range(REPEATS):
+        cumulative, error = import_profile(module, cwd)
+        if cumulative is None:
+            return None, error, []
+        if best is None or cumulative[module] < best:
+            best = cumulative[module]
+            heaviest = sorted(
+                (
+                    (total, name)
+                    for name, total in cumulative.items()
+                    if "." not in name and name != "src"
+                ),
+                reverse=True,
+            )[:3]
+    return best / 1000, None, heaviest
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as outside:
+        for label, cwd in (("repo root", ROOT), ("other directory", outside)):
+            print(f"--- import from {label} (best of {REPEATS}) ---")
+            for module in MODULES:
+                ms, error, heaviest = measure(module, cwd)
+                if error:
+                    print(f"{module:<24} FAILED: {error}")
+                    continue
+                top = ", ".join(
+                    f"{name} {total / 1000:.0f}ms" for total, name in heaviest
+                )
+                print(f"{module:<24} {ms:>8.1f} ms   heaviest: {top}")
+
+        tokens, error = tokenize_from(outside)
+        print(f"\ntokenize_query from other directory: {tokens or 'FAILED: ' + error}")
+
+        # Importing and tokenizing must not leave files (logs, config directories) behind.
+        leftovers = sorted(path.name for path in Path(outside).iterdir())
+        print(f"\nfiles created outside the repo: {leftovers or 'none'}")
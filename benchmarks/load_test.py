@@ -0,0 +1,88 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.config_loader import AppConfig
+
+CONCURRENCY = 32
+REQUESTS = 2000
+TOP_K = 5
+
+
+async def open_connection(config):
+    if config.server_unix_socket:
+        return await asyncio.open_unix_connection(str(config.server_unix_socket))
+    return await asyncio.open_connection(config.server_host, config.server_port)
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode(
+            "latin-1"
+        )
+        + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    reply = json.loads(await reader.readexactly(int(headers["content-length"])))
+    if status != 200:
+        raise RuntimeError(f"{method} {path} -> {status}: {reply}")
+    return reply
+
+
+async def client(config, queries, latencies, counter):
+    # One keep-alive connection per simulated client, each sending its next
+    # request as soon as the previous reply arrives.
+    reader, writer = await open_connection(config)
+    try:
+        while counter[0] < REQUESTS:
+            query_text = queries[counter[0] % len(queries)]
+            counter[0] += 1
+            start = time.perf_counter()
+            await request(
+                reader, writer, "POST", "/search", {"query": query_text, "k": TOP_K}
+            )
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def main(config, queries):
+    reader, writer = await open_connection(config)
+    health = await request(reader, writer, "GET", "/health")
+    before = await request(reader, writer, "GET", "/stats")
+
+    latencies, counter = [], [0]
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(client(config, queries, latencies, counter) for _ in range(CONCURRENCY))
+    )
+    elapsed = time.perf_counter() - start
+
+    after = await request(reader, writer, "GET", "/stats")
+    writer.close()
+
+    latencies_ms = np.asarray(latencies) * 1000
+    batches = after["batches"] - before["batches"]
+    print(f"{health['model']} over {health['documents']} documents")
+    print(f"{len(latencies)} requests, {CONCURRENCY} concurrent clients")
+    print(f"QPS:        {len(latencies) / elapsed:,.0f}")
+    print(f"p50:        {np.percentile(latencies_ms, 50):.2f} ms")
+    print(f"p99:        {np.percentile(latencies_ms, 99):.2f} ms")
+    print(f"mean batch: {(after['requests'] - before['requests']) / batches:.1f}")
+
+
+if __name__ == "__main__":
+    config = AppConfig()
+    queries = pd.read_json(config.test_questions_path)["query_text"].tolist()
+    asyncio.run(main(config, queries))
@@ -0,0 +1,82 @@
+import sys
+from collections import Counter
+
+from src.config_loader import AppConfig
+from src.ingestion import iter_passages
+from src.language_retriever import BigramRetriever
+from src.tokenized_corpus import TokenizedCorpus
+
+
+def deep_size(obj, seen):
+    # Counts every distinct object once, so vocabulary strings shared between
+    # documents are not charged per document.
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def legacy_counters(model):
+    # The per-document Counter storage the language models used to keep.
+    vocab, vocab_size = model.vocab, len(model.vocab)
+    term_freqs, bigram_freqs = [], []
+    for doc_idx in range(len(model.doc_lengths)):
+        row = model.doc_term_matrix[doc_idx]
+        term_freqs.append(
+            Counter(
+                {vocab[t]: tf for t, tf in zip(row.indices.tolist(), row.data.tolist())}
+            )
+        )
+
+        row = model.doc_bigram_matrix[doc_idx]
+        pairs = Counter()
+        for key, count in zip(row.indices.tolist(), row.data.tolist()):
+            w1, w2 = divmod(key, vocab_size)
+            pairs[(vocab[w1], vocab[w2])] = count
+        bigram_freqs.append(pairs)
+    return term_freqs, bigram_freqs
+
+
+def csr_bytes(matrix):
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+if __name__ == "__main__":
+    config = AppConfig()
+    datasets = {
+        "train": config.train_passages_path,
+        "val": config.val_passages_path,
+        "test": config.test_passages_path,
+    }
+
+    print(
+        f"{'corpus':<8} {'docs':>6} {'Counters':>9} {'int64 CSR':>10} "
+        f"{'before':>8} {'after':>7} {'saving':>7}   (bytes per document)"
+    )
+    for name, path in datasets.items():
+        corpus = TokenizedCorpus.from_passages(iter_passages(path))
+        model = BigramRetriever(config, mu=1000)
+        model.fit(corpus)
+        matrices = (model.doc_term_matrix, model.doc_bigram_matrix)
+        num_docs = len(corpus)
+
+        # Before: Counters next to CSR matrices holding int64 counts.
+        # After: the same CSR layout with uint16 counts and no Counters.
+        counters = deep_size(legacy_counters(model), set()) / num_docs
+        compact = sum(csr_bytes(matrix) for matrix in matrices) / num_docs
+        wide = (
+            compact
+            + sum(matrix.nnz * 8 - matrix.data.nbytes for matrix in matrices) / num_docs
+        )
+        before = counters + wide
+
+        print(
+            f"{name:<8} {num_docs:>6} {counters:>9,.0f} {wide:>10,.0f} "
+            f"{before:>8,.0f} {compact:>7,.0f} {before / compact:>6.1f}x"
+        )
@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.suite import synthetic_passages
+from src.bm25_retriever import BM25Retriever
+from src.config_loader import AppConfig
+from src.ingestion import iter_passages
+from src.tokenized_corpus import TokenizedCorpus
+
+# Tuned parameters reported by pipeline.run.
+K1, B = 1.6, 1.0
+# Test passages resampled to this many times their size.
+SCALES = (1, 20, 100)
+DEPTHS = (5, 20, 100)
+REPEATS = 5
+
+
+def single_query_ms(model, queries, k):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        top_indices = [model.retrieve_top_k(query_text, k=k) for query_text in queries]
+        best = min(best, time.perf_counter() - start)
+    return best * 1000 / len(queries), top_indices
+
+
+def main(config):
+    passages = list(iter_passages(config.test_passages_path))
+    queries = pd.read_json(config.test_questions_path)["query_text"].tolist()
+    print(f"{len(queries)} queries, k1={K1}, b={B}\n")
+    print(
+        f"{'docs':>7}{'k':>5}{'postings ms':>13}{'MaxScore ms':>13}"
+        f"{'speedup':>9}{'docs scored':>13}{'identical':>11}"
+    )
+
+    for scale in SCALES:
+        corpus = TokenizedCorpus.from_passages(synthetic_passages(passages, scale))
+        exhaustive = BM25Retriever(config, k1=K1, b=B)
+        exhaustive.fit(corpus)
+        pruned = BM25Retriever(config, k1=K1, b=B, pruning=True)
+        pruned.fit(corpus)
+
+        for k in DEPTHS:
+            reference_ms, reference = single_query_ms(exhaustive, queries, k)
+            pruned.pruning_stats["docs_evaluated"] = 0
+            pruned_ms, top_indices = single_query_ms(pruned, queries, k)
+            scored = pruned.pruning_stats["docs_evaluated"] / (REPEATS * len(queries))
+            identical = np.mean(
+                [np.array_equal(a, b) for a, b in zip(top_indices, reference)]
+            )
+            print(
+                f"{len(corpus):>7}{k:>5}{reference_ms:>13.3f}{pruned_ms:>13.3f}"
+                f"{reference_ms / pruned_ms:>8.1f}x{scored:>13.0f}{identical:>11.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main(AppConfig())
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.suite import synthetic_passages
+from src.bm25_retriever import BM25Retriever
+from src.config_loader import AppConfig
+from src.ingestion import iter_passages
+from src.language_retriever import BigramRetriever, UnigramRetriever
+from src.sharding import ShardedRetriever
+from src.tokenized_corpus import TokenizedCorpus
+
+# Test passages resampled to this many times their size.
+SCALE = 20
+TOP_K = 5
+SHARDS = (2, 4)
+EXECUTORS = ("thread", "process")
+RETRIEVERS = {
+    "bm25": (BM25Retriever, {"k1": 1.6, "b": 1.0}),
+    "unigram": (UnigramRetriever, {"mu": 2000, "backend": "sparse"}),
+    "bigram": (BigramRetriever, {"mu": 2000, "lambda_": 0.7, "backend": "sparse"}),
+}
+
+
+def single_query_ms(model, queries):
+    # Shards score each query on its own, so the single index does too.
+    start = time.perf_counter()
+    top_indices = np.full((len(queries), TOP_K), -1, dtype=np.int64)
+    for row, query_text in enumerate(queries):
+        indices = model.retrieve_top_k(query_text, k=TOP_K)
+        top_indices[row, : len(indices)] = indices
+    return (time.perf_counter() - start) * 1000 / len(queries), top_indices
+
+
+def batch_ms(model, queries):
+    # Warm-up first: process shards start and load their index on first use.
+    model.retrieve_top_k_batch(queries[:1], k=TOP_K)
+    start = time.perf_counter()
+    top_indices = model.retrieve_top_k_batch(queries, k=TOP_K)
+    return (time.perf_counter() - start) * 1000 / len(queries), top_indices
+
+
+def main(config):
+    passages = list(iter_passages(config.test_passages_path))
+    corpus = TokenizedCorpus.from_passages(synthetic_passages(passages, SCALE))
+    queries = pd.read_json(config.test_questions_path)["query_text"].tolist()
+    print(f"{len(corpus)} passages, {len(queries)} queries, k={TOP_K}\n")
+    print(f"{'retriever':<10}{'shards':<16}{'ms/query':>10}{'identical':>11}")
+
+    for name, (retriever_cls, params) in RETRIEVERS.items():
+        single = retriever_cls(config, **params)
+        single.fit(corpus)
+        reference_ms, reference = single_query_ms(single, queries)
+        print(f"{name:<10}{'single index':<16}{reference_ms:>10.3f}{'-':>11}")
+
+        for executor in EXECUTORS:
+            for num_shards in SHARDS:
+                sharded = ShardedRetriever(
+                    retriever_cls,
+                    config,
+                    num_shards=num_shards,
+                    executor=executor,
+                    **params,
+                )
+                with sharded.fit(corpus):
+                    ms, top_indices = batch_ms(sharded, queries)
+                label = f"{num_shards} x {executor}"
+                identical = np.mean((top_indices == reference).all(axis=1))
+                print(f"{'':<10}{label:<16}{ms:>10.3f}{identical:>11.1%}")
+
+
+if __name__ == "__main__":
+    main(AppConfig())
@@ -0,0 +1,296 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.bm25_retriever import BM25Retriever
+from src.config_loader import AppConfig
+from src.fine_tuning import fine_tune_bigram, fine_tune_bm25, fine_tune_unigram
+from src.ingestion import iter_passages
+from src.language_retriever import BigramRetriever, UnigramRetriever
+from src.metrics import Evaluator
+from src.tokenized_corpus import TokenizedCorpus
+from src.utils import parse_judgments
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_SCALES = (10, 100)
+REPEATS = 3
+TOLERANCE = 0.2
+# Timings this short are dominated by timer noise and are not compared.
+MIN_SECONDS = 0.005
+SEED = 0
+# Depths at which batch retrieval must rank exactly like single queries.
+CONSISTENCY_DEPTHS = (5, 20, 200)
+
+RETRIEVERS = {
+    "bm25": (BM25Retriever, {"k1": 1.6, "b": 1.0}),
+    "unigram": (UnigramRetriever, {"mu": 2000, "backend": "sparse"}),
+    "bigram": (BigramRetriever, {"mu": 2000, "lambda_": 0.7, "backend": "sparse"}),
+}
+
+# Metrics ending in one of these suffixes are better when higher; everything
+# else (seconds, milliseconds, megabytes) is better when lower.
+HIGHER_IS_BETTER = ("_per_sec",)
+
+
+def synthetic_passages(passages, scale, seed=SEED):
+    # Passages drawn from the corpus' own word distribution and length
+    # distribution, ``scale`` times as many as the source.
+    rng = np.random.default_rng(seed)
+    words = np.array(" ".join(text for _, text in passages).split())
+    lengths = rng.choice(
+        [len(text.split()) for _, text in passages], scale * len(passages)
+    )
+    starts = np.concatenate([[0], np.cumsum(lengths)])
+    tokens = words[rng.integers(len(words), size=starts[-1])]
+    return [
+        (f"syn{idx}", " ".join(tokens[start:end]))
+        for idx, (start, end) in enumerate(zip(starts[:-1], starts[1:]))
+    ]
+
+
+def timed(fn, repeats=1, trace_memory=True):
+    # Best of ``repeats`` wall-clock runs. tracemalloc slows down every
+    # allocation, so the peak traced allocation comes from one more, untimed
+    # run.
+    peak_mb = None
+    if trace_memory:
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / 2**20
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best, peak_mb
+
+
+def fit_model(config, name, corpus):
+    retriever_cls, params = RETRIEVERS[name]
+    model = retriever_cls(config, **params)
+    model.fit(corpus)
+    return model
+
+
+def bench_fit(config, corpora, results):
+    for corpus_name, passages in corpora.items():
+        repeats = REPEATS if len(passages) < 10_000 else 1
+        _, seconds, peak = timed(lambda: TokenizedCorpus.from_passages(passages))
+        results[f"tokenize/{corpus_name}"] = {"seconds": seconds, "peak_mb": peak}
+
+        corpus = TokenizedCorpus.from_passages(passages)
+        for name in RETRIEVERS:
+            _, seconds, peak = timed(lambda: fit_model(config, name, corpus), repeats)
+            results[f"fit/{name}/{corpus_name}"] = {
+                "seconds": seconds,
+                "peak_mb": peak,
+                "docs_per_sec": len(passages) / seconds,
+            }
+            print(f"fit/{name}/{corpus_name}: {seconds:.3f}s, {peak:.1f} MB peak")
+
+
+def ranking_mismatches(model, queries):
+    # The Evaluator prefers the batch path, so metrics must not depend on it.
+    mismatches = []
+    for k in CONSISTENCY_DEPTHS:
+        top_indices = model.retrieve_top_k_batch(queries, k=k)
+        for query_text, row in zip(queries, top_indices):
+            single = np.asarray(model.retrieve_top_k(query_text, k=k))
+            if not np.array_equal(single, row[row >= 0]):
+                mismatches.append((k, query_text))
+    return mismatches
+
+
+def bench_queries(config, corpus, queries, results):
+    for name in RETRIEVERS:
+        model = fit_model(config, name, corpus)
+        mismatches = ranking_mismatches(model, queries)
+        if mismatches:
+            raise SystemExit(
+                f"query/{name}: batch and single-query rankings differ for "
+                f"{len(mismatches)} (k, query) pairs, e.g. {mismatches[0]}"
+            )
+
+        latencies = []
+        for _ in range(REPEATS):
+            for query_text in queries:
+                start = time.perf_counter()
+                model.retrieve_top_k(query_text, k=5)
+                latencies.append(time.perf_counter() - start)
+        latencies_ms = np.asarray(latencies) * 1000
+
+        _, batch_seconds, _ = timed(
+            lambda: model.retrieve_top_k_batch(queries, k=5),
+            REPEATS,
+            trace_memory=False,
+        )
+        results[f"query/{name}"] = {
+            "single_p50_ms": np.percentile(latencies_ms, 50).item(),
+            "single_p99_ms": np.percentile(latencies_ms, 99).item(),
+            "batch_ms_per_query": batch_seconds * 1000 / len(queries),
+            "batch_queries_per_sec": len(queries) / batch_seconds,
+        }
+        print(
+            f"query/{name}: p50 {results[f'query/{name}']['single_p50_ms']:.3f} ms, "
+            f"batch {results[f'query/{name}']['batch_ms_per_query']:.3f} ms/query"
+        )
+
+
+def bench_evaluation(config, corpus, questions, judgments, results):
+    evaluator = Evaluator(judgments)
+    for name in RETRIEVERS:
+        model = fit_model(config, name, corpus)
+        _, seconds, _ = timed(
+            lambda: evaluator.evaluate_model(model, questions, corpus),
+            REPEATS,
+            trace_memory=False,
+        )
+        results[f"evaluate/{name}"] = {
+            "seconds": seconds,
+            "queries_per_sec": len(questions) / seconds,
+        }
+        print(f"evaluate/{name}: {seconds:.3f}s")
+
+
+def bench_tuning(config, train_corpus, val_corpus, questions, judgments, results):
+    args = (config, train_corpus, val_corpus, questions, judgments)
+    best_mu = {}
+
+    def tune_unigram():
+        best_mu.update(fine_tune_unigram(*args))
+
+    sweeps = {
+        "bm25": lambda: fine_tune_bm25(*args),
+        "unigram": tune_unigram,
+        "bigram": lambda: fine_tune_bigram(*args, best_mu=best_mu["mu"]),
+    }
+    for name, sweep in sweeps.items():
+        _, seconds, _ = timed(sweep, trace_memory=False)
+        results[f"tune/{name}"] = {"seconds": seconds}
+        print(f"tune/{name}: {seconds:.3f}s")
+
+
+def run(args):
+    config = AppConfig()
+    passages = {
+        "train": list(iter_passages(config.train_passages_path)),
+        "val": list(iter_passages(config.val_passages_path)),
+        "test": list(iter_passages(config.test_passages_path)),
+    }
+    corpora = dict(passages)
+    for scale in args.scales:
+        corpora[f"test_x{scale}"] = synthetic_passages(passages["test"], scale)
+
+    test_corpus = TokenizedCorpus.from_passages(passages["test"])
+    test_questions = pd.read_json(config.test_questions_path)
+    val_questions = pd.read_json(config.val_questions_path)
+
+    results = {}
+    bench_fit(config, corpora, results)
+    bench_queries(config, test_corpus, test_questions["query_text"].tolist(), results)
+    bench_evaluation(
+        config,
+        test_corpus,
+        test_questions,
+        parse_judgments(config.test_judgments_path),
+        results,
+    )
+    if not args.skip_tuning:
+        bench_tuning(
+            config,
+            TokenizedCorpus.from_passages(passages["train"]),
+            TokenizedCorpus.from_passages(passages["val"]),
+            val_questions,
+            parse_judgments(config.val_judgments_path),
+            results,
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to '{output}'")
+
+
+def compare(args):
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)["results"]
+
+    regressions = 0
+    for case in sorted(baseline.keys() & current.keys()):
+        for metric in sorted(baseline[case].keys() & current[case].keys()):
+            before, after = baseline[case][metric], current[case][metric]
+            if before == 0 or (
+                metric == "seconds" and max(before, after) < MIN_SECONDS
+            ):
+                continue
+
+            change = (after - before) / before
+            if metric.endswith(HIGHER_IS_BETTER):
+                change = -change
+            regressed = change > args.tolerance
+            regressions += regressed
+
+            flag = "REGRESSION" if regressed else ""
+            print(
+                f"{case + ' ' + metric:<48} {before:>12.4f} {after:>12.4f} "
+                f"{change:>+8.1%} {flag}"
+            )
+
+    missing = sorted(baseline.keys() - current.keys())
+    if missing:
+        print(f"\nCases missing from the current run: {missing}")
+    print(
+        f"\n{regressions} regression(s) beyond {args.tolerance:.0%} "
+        f"(positive change = slower or bigger)"
+    )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "--scales", type=int, nargs="*", default=list(DEFAULT_SCALES)
+    )
+    run_parser.add_argument("--skip-tuning", action="store_true")
+    run_parser.add_argument(
+        "--output", default=RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--baseline", default="benchmarks/baseline.json")
+    compare_parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
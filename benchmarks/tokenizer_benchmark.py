@@ -0,0 +1,77 @@
+import re
+import time
+
+import pandas as pd
+
+from src.config_loader import AppConfig
+from src.utils import get_tokenizer, load_stopwords
+
+REPEATS = 20
+
+# The tokenizer as it was before the Tokenizer component: list stopwords,
+# re.findall with a pattern string and an eagerly formatted debug message.
+_legacy_stopwords = []
+
+
+def legacy_tokenizer(text):
+    if not isinstance(text, str):
+        return []
+
+    text = text.lower().strip()
+    tokens = re.findall(r"\w+", text)
+
+    filtered = [
+        token
+        for token in tokens
+        if token not in _legacy_stopwords and not token.isnumeric()
+    ]
+    _ = f"Tokenizer processed text | tokens_in={len(tokens)}, tokens_out={len(filtered)}"
+    return filtered
+
+
+def measure(name, tokenize_all, texts):
+    start = time.perf_counter()
+    num_tokens = 0
+    for _ in range(REPEATS):
+        num_tokens += sum(len(tokens) for tokens in tokenize_all(texts))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {num_tokens / elapsed:>14,.0f} tokens/sec  ({elapsed:.3f}s)")
+    return num_tokens / elapsed
+
+
+if __name__ == "__main__":
+    config = AppConfig()
+    _legacy_stopwords.extend(load_stopwords(config.stopwords_path))
+    default_tokenizer = get_tokenizer()
+    texts = []
+    for path in (
+        config.train_passages_path,
+        config.val_passages_path,
+        config.test_passages_path,
+    ):
+        texts.extend(pd.read_json(path, orient="columns")["passage_text"])
+
+    expected = [legacy_tokenizer(text) for text in texts]
+    assert [default_tokenizer.tokenize(text) for text in texts] == expected
+    assert list(default_tokenizer.tokenize_many(texts)) == expected
+    assert [default_tokenizer.tokenize_query(text) for text in texts] == expected
+
+    print(f"{len(texts)} passages x {REPEATS} repeats, outputs identical\n")
+    before = measure(
+        "legacy tokenizer", lambda ts: (legacy_tokenizer(t) for t in ts), texts
+    )
+    after = measure(
+        "Tokenizer.tokenize", lambda ts: (default_tokenizer(t) for t in ts), texts
+    )
+    bulk = measure("Tokenizer.tokenize_many", default_tokenizer.tokenize_many, texts)
+    cached = measure(
+        "Tokenizer.tokenize_query",
+        lambda ts: (default_tokenizer.tokenize_query(t) for t in ts),
+        texts,
+    )
+
+    print(
+        f"\nspeedup: tokenize x{after / before:.1f}, "
+        f"tokenize_many x{bulk / before:.1f}, "
+        f"cached queries x{cached / before:.1f}"
+    )
@@ -1,23 +1,86 @@
+import time
+
+import numpy as np
 import pandas as pd
 
 from src.bm25_retriever import BM25Retriever
+from src.cascade import CascadeRetriever
 from src.config_loader import AppConfig
 from src.fine_tuning import fine_tune_bigram, fine_tune_bm25, fine_tune_unigram
+from src.ingestion import iter_passages
+from src.instrumentation import format_report, instrumentation, profiling
 from src.language_retriever import BigramRetriever, UnigramRetriever
-from src.logger import get_logger
+from src.logger import configure_logging, get_logger
 from src.metrics import Evaluator
-from src.utils import parse_judgments, plot_results
+from src.tokenized_corpus import TokenizedCorpus
+from src.utils import parse_judgments
 from src.vocab_builder import VocabularyBuilder
 
 logger = get_logger(__name__)
 
-if __name__ == "__main__":
-    config = AppConfig()
 
+def fit_or_load(retriever_cls, config, corpus, vocab, name, **params):
+    # Reuse a saved index when it was built from the same passages and vocabulary.
+    index_path = config.index_dir / name
+    try:
+        retriever = retriever_cls.load(index_path, config, passages=corpus, **params)
+        if retriever.vocab == vocab:
+            return retriever
+        logger.info(f"Saved index '{index_path}' uses another vocabulary, refitting")
+    except (FileNotFoundError, ValueError) as e:
+        logger.info(f"Fitting '{name}' from scratch: {e}")
+
+    retriever = retriever_cls(config, **params)
+    retriever.fit(corpus)
+    retriever.save(index_path)
+    return retriever
+
+
+def timed_run(model, query_texts, k=5):
+    # Single-query latency, the figure a cascade is meant to cut.
+    top_indices = np.full((len(query_texts), k), -1, dtype=np.int64)
+    start = time.perf_counter()
+    for row, query_text in enumerate(query_texts):
+        indices = np.asarray(model.retrieve_top_k(query_text, k=k), dtype=np.int64)
+        top_indices[row, : len(indices)] = indices
+    ms_per_query = (time.perf_counter() - start) * 1000 / len(query_texts)
+    return top_indices, ms_per_query
+
+
+def evaluate_cascades(config, evaluator, first_stage, rerankers, questions, corpus):
+    # Quality and latency of BM25 candidates reranked by each language model at
+    # every configured depth, next to the language model ranking everything.
+    query_texts = questions["query_text"].tolist()
+
+    rows = []
+    for name, reranker in rerankers.items():
+        models = [("all", reranker)] + [
+            (depth, CascadeRetriever(first_stage, reranker, depth))
+            for depth in config.cascade_report_depths
+        ]
+        for depth, model in models:
+            top_indices, ms_per_query = timed_run(model, query_texts)
+            metrics = evaluator.evaluate_runs(top_indices[None], questions, corpus)[0]
+            rows.append({"reranker": name, "depth": depth, "ms/query": ms_per_query})
+            rows[-1].update(metrics)
+            logger.info(f"Cascade BM25 -> {name} at depth {depth}: {rows[-1]}")
+    return pd.DataFrame(rows)
+
+
+def main(config):
     # --- Load Datasets ---
-    train_passage = pd.read_json(config.train_passages_path.resolve(), orient="columns")
-    val_passage = pd.read_json(config.val_passages_path, orient="columns")
-    test_passage = pd.read_json(config.test_passages_path, orient="columns")
+    # Passages are streamed straight into token arrays; only the small question
+    # files are read as DataFrames.
+    workers = config.indexing_workers
+    train_corpus = TokenizedCorpus.from_passages(
+        iter_passages(config.train_passages_path), workers=workers
+    )
+    val_corpus = TokenizedCorpus.from_passages(
+        iter_passages(config.val_passages_path), workers=workers
+    )
+    test_corpus = TokenizedCorpus.from_passages(
+        iter_passages(config.test_passages_path), workers=workers
+    )
 
     val_questions = pd.read_json(config.val_questions_path, orient="columns")
     test_questions = pd.read_json(config.test_questions_path, orient="columns")
@@ -29,49 +92,48 @@ if __name__ == "__main__":
 
     # --- Build Vocabulary ---
     vocab_builder = VocabularyBuilder(config)
-    tokens = vocab_builder.build(train_passage)
+    tokens = vocab_builder.build(train_corpus)
     vocab_builder.save()
 
     # --- BM25 Retriever ---
     logger.info("--- BM25 Section ---")
     bm25_params = fine_tune_bm25(
-        config, train_passage, val_passage, val_questions, val_judgments
+        config, train_corpus, val_corpus, val_questions, val_judgments
     )
 
-    bm25_retriever = BM25Retriever(config, **bm25_params)
-    bm25_retriever.fit(test_passage)
-    bm25_results = evaluator.evaluate_model(
-        bm25_retriever, test_questions, test_passage
+    bm25_retriever = fit_or_load(
+        BM25Retriever, config, test_corpus, tokens, "test_bm25", **bm25_params
     )
+    bm25_results = evaluator.evaluate_model(bm25_retriever, test_questions, test_corpus)
 
     # --- Unigram Retriever ---
     logger.info("--- Unigram Section ---")
     unigram_params = fine_tune_unigram(
-        config, train_passage, val_passage, val_questions, val_judgments
+        config, train_corpus, val_corpus, val_questions, val_judgments
     )
 
-    unigram_retriever = UnigramRetriever(config, mu=unigram_params["mu"])
-    unigram_retriever.fit(test_passage)
+    unigram_retriever = fit_or_load(
+        UnigramRetriever, config, test_corpus, tokens, "test_unigram", **unigram_params
+    )
     uni_results = evaluator.evaluate_model(
-        unigram_retriever, test_questions, test_passage
+        unigram_retriever, test_questions, test_corpus
     )
 
     # --- Bigram Retriever ---
     logger.info("--- Bigram Section ---")
     bigram_params = fine_tune_bigram(
         config,
-        train_passage,
-        val_passage,
+        train_corpus,
+        val_corpus,
         val_questions,
         val_judgments,
         best_mu=unigram_params["mu"],
     )
 
-    bigram_retriever = BigramRetriever(config, **bigram_params)
-    bigram_retriever.fit(test_passage)
-    bi_results = evaluator.evaluate_model(
-        bigram_retriever, test_questions, test_passage
+    bigram_retriever = fit_or_load(
+        BigramRetriever, config, test_corpus, tokens, "test_bigram", **bigram_params
     )
+    bi_results = evaluator.evaluate_model(bigram_retriever, test_questions, test_corpus)
 
     # --- Final Comparisons ---
     print("\n" + "=" * 40)
@@ -88,5 +150,36 @@ if __name__ == "__main__":
     print(f"Unigram: {uni_results}")
     print(f"Bigram:  {bi_results}")
 
+    cascade_results = evaluate_cascades(
+        config,
+        evaluator,
+        bm25_retriever,
+        {"Unigram": unigram_retriever, "Bigram": bigram_retriever},
+        test_questions,
+        test_corpus,
+    )
+    print("\n" + "=" * 40)
+    print("CASCADE: BM25 CANDIDATES, LM RERANKING")
+    print("=" * 40)
+    print(cascade_results.to_string(index=False, float_format="{:.4f}".format))
+
     # --- Plot Results ---
-    plot_results(bm25_results, uni_results, bi_results)
+    # Imported here: seaborn and matplotlib dominate the startup time otherwise.
+    from src.plotting import plot_results
+
+    plot_results(bm25_results, uni_results, bi_results, config.results_plot)
+
+
+if __name__ == "__main__":
+    configure_logging()
+    config = AppConfig()
+    instrumentation.configure(config)
+    with profiling(config.profile_mode, config.profile_dir):
+        main(config)
+
+    if config.instrumentation_enabled:
+        report, report_path = instrumentation.write_report(config.profile_dir)
+        print("\n" + "=" * 40)
+        print(f"INSTRUMENTATION ({report_path})")
+        print("=" * 40)
+        print(format_report(report))
@@ -0,0 +1,68 @@
+import asyncio
+
+from src.bm25_retriever import BM25Retriever
+from src.config_loader import AppConfig
+from src.ingestion import iter_passages
+from src.instrumentation import instrumentation
+from src.language_retriever import BigramRetriever, UnigramRetriever
+from src.logger import configure_logging, get_logger
+from src.server import RetrievalServer
+from src.tokenized_corpus import TokenizedCorpus
+
+logger = get_logger(__name__)
+
+RETRIEVERS = {
+    "bm25": BM25Retriever,
+    "unigram": UnigramRetriever,
+    "bigram": BigramRetriever,
+}
+
+# Used only when no saved index exists yet; pipeline.run saves tuned ones.
+DEFAULT_PARAMS = {
+    "bm25": {},
+    "unigram": {"mu": 2000},
+    "bigram": {"mu": 2000, "lambda_": 0.7},
+}
+
+
+def load_retriever(config):
+    name = config.server_model
+    if name not in RETRIEVERS:
+        msg = f"Unknown server model '{name}', expected one of {list(RETRIEVERS)}"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    retriever_cls = RETRIEVERS[name]
+    corpus = TokenizedCorpus.from_passages(
+        iter_passages(config.test_passages_path), workers=config.indexing_workers
+    )
+    # Same location as the tuned test index written by pipeline.run.
+    index_path = config.index_dir / f"test_{name}"
+    try:
+        return retriever_cls.load(index_path, config, passages=corpus), index_path
+    except (FileNotFoundError, ValueError) as e:
+        logger.info(f"Fitting '{name}' with default parameters: {e}")
+
+    retriever = retriever_cls(config, **DEFAULT_PARAMS[name])
+    retriever.fit(corpus)
+    retriever.save(index_path)
+    return retriever, index_path
+
+
+if __name__ == "__main__":
+    configure_logging()
+    config = AppConfig()
+    instrumentation.configure(config)
+    model, index_path = load_retriever(config)
+
+    server = RetrievalServer.from_config(model, config, index_path=index_path)
+    try:
+        asyncio.run(
+            server.serve(
+                host=config.server_host,
+                port=config.server_port,
+                unix_socket=config.server_unix_socket,
+            )
+        )
+    except KeyboardInterrupt:
+        logger.info("Retrieval server stopped")
@@ -1,24 +1,78 @@
 import json
-from collections import Counter
+import logging
 
 import numpy as np
+from scipy.sparse import csr_matrix
 
 from .config_loader import AppConfig
+from .incremental import UpdatableIndex, reads_snapshot
+from .index_store import load_index, save_index
+from .instrumentation import instrumentation
+from .inverted_index import ImpactIndex, InvertedIndex
 from .logger import get_logger
-from .utils import tokenizer
+from .tokenized_corpus import as_corpus
+from .utils import boundary_candidates, tokenize_query, top_k_indices
 
 logger = get_logger(__name__)
 
+# Absorbs rounding differences between summed upper bounds and exact scores.
+_BOUND_SLACK = 1e-9
 
-class BM25Retriever:
-    def __init__(self, config: AppConfig, k1: float = 1.5, b: float = 0.75):
+
+class BM25Retriever(UpdatableIndex):
+    BACKENDS = ("postings", "sparse", "impact")
+    PARAMS = ("k1", "b")
+    # Constructor options that are not scoring parameters, forwarded whenever
+    # a saved index is loaded in another process.
+    OPTIONS = ("backend", "pruning", "impact_bits", "impact_budget")
+
+    def __init__(
+        self,
+        config: AppConfig,
+        k1: float = 1.5,
+        b: float = 0.75,
+        backend: str = "postings",
+        pruning: bool = False,
+        result_cache=None,
+        impact_bits: int = 8,
+        impact_budget=None,
+    ):
+        if backend not in self.BACKENDS:
+            msg = f"Unknown BM25 backend '{backend}', expected one of {self.BACKENDS}"
+            logger.error(msg)
+            raise ValueError(msg)
+        if pruning and backend != "postings":
+            msg = "MaxScore pruning requires the 'postings' backend"
+            logger.error(msg)
+            raise ValueError(msg)
+        if impact_bits not in ImpactIndex.DTYPES:
+            msg = (
+                f"Unsupported impact width {impact_bits}, "
+                f"expected one of {list(ImpactIndex.DTYPES)}"
+            )
+            logger.error(msg)
+            raise ValueError(msg)
+
+        super().__init__(result_cache)
         self.config = config
         self.k1 = k1
         self.b = b
+        self.backend = backend
+        self.pruning = pruning
+        # Impact backend: quantization width and the optional number of
+        # postings processed per query before scoring stops early.
+        self.impact_bits = impact_bits
+        self.impact_budget = impact_budget
 
-        self.idf = {}
-        self.avg_dl = 0
-        self.doc_term_freqs, self.doc_lengths = [], []
+        # Documents fully scored by the MaxScore path (last query / running
+        # total); shared with the published copies that answer the queries.
+        self.pruning_stats = {"last_docs_evaluated": 0, "docs_evaluated": 0}
+
+        self.index = None
+        self.idf = np.array([])
+        self.avg_doc_length = 0
+        self.doc_lengths = np.array([])
+        self.weight_matrix = None
 
     def _load_vocabulary(self):
         logger.debug(f"Loading vocabulary from {self.config.tokens_path}")
@@ -29,62 +83,403 @@ class BM25Retriever:
         self.vocab_map = {word: idx for idx, word in enumerate(self.vocab)}
         logger.debug(f"Loaded {len(self.vocab)} vocabulary terms")
 
-    def fit(self, passages_df):
+    def fit(self, passages_df, workers: int = 1):
         logger.debug("Starting BM25 training...")
         self._load_vocabulary()
 
-        total_docs = len(passages_df)
-        total_length = 0
-        doc_freq_per_word = Counter()
-
-        self.doc_lengths = []
-        self.doc_term_freqs = []
-
-        for text in passages_df["passage_text"]:
-            tokens = tokenizer(text)
-            doc_len = len(tokens)
+        corpus = as_corpus(passages_df, workers=workers)
+        with instrumentation.timer("index"):
+            self.index = InvertedIndex.from_corpus(corpus, self.vocab_map)
+            self.source_checksum = corpus.checksum
+            self._reset_documents(corpus.doc_ids, len(corpus))
 
-            self.doc_lengths.append(doc_len)
-            total_length += doc_len
+            self._refresh_statistics()
+        logger.debug("BM25 training completed successfully.")
 
-            term_counts = Counter(t for t in tokens if t in self.vocab_map)
-            self.doc_term_freqs.append(term_counts)
+    def collection_statistics(self):
+        # Collection statistics count live documents only; tombstoned postings
+        # are subtracted from the document frequencies until compaction.
+        doc_lengths = self.index.doc_lengths
+        n_q = self.index.doc_freqs
+        if self._has_deletes:
+            deleted_postings = self.deleted[self.index.doc_ids]
+            n_q = n_q - np.bincount(
+                self.index.posting_terms()[deleted_postings],
+                minlength=self.index.num_terms,
+            )
+            live_length = doc_lengths[~self.deleted].sum().item()
+        else:
+            live_length = doc_lengths.sum().item()
+        return {
+            "num_docs": self.num_live_docs,
+            "total_length": live_length,
+            "doc_freqs": n_q,
+        }
 
-            for word in term_counts:
-                doc_freq_per_word[word] += 1
+    def _refresh_statistics(self):
+        self.doc_lengths = self.index.doc_lengths
+        statistics = self.shared_statistics
+        if statistics is None:
+            statistics = self.collection_statistics()
+        total_docs = statistics["num_docs"]
+        n_q = statistics["doc_freqs"]
 
-        self.avg_doc_length = total_length / total_docs
+        self.avg_doc_length = statistics["total_length"] / max(total_docs, 1)
         logger.debug(f"Average document length: {self.avg_doc_length:.2f}")
 
         logger.debug("Computing IDF values...")
-        for word in self.vocab:
-            n_q = doc_freq_per_word[word]
-            self.idf[word] = np.log(((total_docs - n_q + 0.5) / (n_q + 0.5)) + 1)
-        logger.debug("BM25 training completed successfully.")
+        self.idf = np.log(((total_docs - n_q + 0.5) / (n_q + 0.5)) + 1)
+
+        self._prepare_scoring()
+
+    def _append_corpus(self, corpus):
+        self.index = self.index.append(
+            InvertedIndex.from_corpus(corpus, self.vocab_map)
+        )
+
+    def _compact_rows(self, keep):
+        self.index = self.index.select(keep)
+
+    def get_params(self):
+        return {name: getattr(self, name) for name in self.PARAMS}
 
-    def _score_document(self, query_tokens, doc_index):
-        score = 0.0
-        doc_len = self.doc_lengths[doc_index]
-        term_freqs = self.doc_term_freqs[doc_index]
+    def get_options(self):
+        return {name: getattr(self, name) for name in self.OPTIONS}
 
-        for word in query_tokens:
-            if word not in self.vocab_map:
-                continue
-            tf = term_freqs.get(word, 0)
-            idf = self.idf[word]
+    def set_params(self, **params):
+        # Only the scoring parameters change; the fitted index, document lengths
+        # and IDF are reused, so a sweep fits once and re-scores per grid point.
+        for name, value in params.items():
+            if name not in self.PARAMS:
+                msg = f"Unknown BM25 parameter '{name}', expected one of {self.PARAMS}"
+                logger.error(msg)
+                raise ValueError(msg)
+            setattr(self, name, value)
+        # Later queries run on a fresh copy with the new parameters.
+        self._snapshot = None
 
-            numerator = tf * (self.k1 + 1)
-            denominator = tf + self.k1 * (
-                1 - self.b + self.b * (doc_len / self.avg_doc_length)
+        if self.index is not None:
+            self._prepare_scoring()
+        return self
+
+    def _prepare_scoring(self):
+        # Per-document part of the BM25 denominator, fixed once k1/b are known.
+        self._length_norm = self.k1 * (
+            1 - self.b + self.b * (self.doc_lengths / self.avg_doc_length)
+        )
+
+        self.weight_matrix = None
+        self.impact_index = None
+        if self.backend == "impact":
+            self.impact_index = ImpactIndex.from_postings(
+                self.index, self._posting_contributions(), self.impact_bits
             )
-            score += idf * (numerator / denominator)
-        return score
+        if self.backend == "sparse":
+            self._build_weight_matrix()
+        if self.pruning:
+            self._compute_upper_bounds()
 
-    def retrieve_top_k(self, query_text: str, k: int = 5):
-        query_tokens = tokenizer(query_text)
-        scores = [
-            self._score_document(query_tokens, i)
-            for i in range(len(self.doc_term_freqs))
+    def _posting_contributions(self):
+        # Full BM25 contribution of every posting, in postings order.
+        tfs, doc_ids = self.index.tfs, self.index.doc_ids
+        return self.idf[self.index.posting_terms()] * (
+            (tfs * (self.k1 + 1)) / (tfs + self._length_norm[doc_ids])
+        )
+
+    def _compute_upper_bounds(self):
+        # Largest contribution any single document can get from each term; the
+        # contributions themselves give MaxScore its partial scores.
+        self._contributions = self._posting_contributions()
+        self.upper_bounds = np.zeros(self.index.num_terms)
+        np.maximum.at(
+            self.upper_bounds, self.index.posting_terms(), self._contributions
+        )
+
+    def save(self, path):
+        header = {
+            "model": "bm25",
+            "params": self.get_params(),
+            "checksum": self.source_checksum,
+            "avg_doc_length": self.avg_doc_length,
+            "vocab": self.vocab,
+            "doc_ids": self.doc_ids,
+            "next_doc_id": self.next_doc_id,
+        }
+        arrays = {
+            "doc_lengths": self.index.doc_lengths,
+            "offsets": self.index.offsets,
+            "doc_ids": self.index.doc_ids,
+            "tfs": self.index.tfs,
+            "idf": self.idf,
+            "deleted": self.deleted,
+        }
+        save_index(path, header, arrays)
+
+    @classmethod
+    def load(cls, path, config: AppConfig, passages=None, **options):
+        # ``passages`` (anything ``fit`` accepts) enables the staleness check.
+        header, arrays = load_index(path, "bm25", passages)
+
+        # Scoring parameters may be overridden; the stored statistics do not
+        # depend on them.
+        retriever = cls(config, **{**header["params"], **options})
+        retriever.vocab = header["vocab"]
+        retriever.vocab_map = {word: idx for idx, word in enumerate(retriever.vocab)}
+        retriever.source_checksum = header["checksum"]
+
+        retriever.index = InvertedIndex(
+            arrays["doc_lengths"], arrays["offsets"], arrays["doc_ids"], arrays["tfs"]
+        )
+        retriever.doc_lengths = retriever.index.doc_lengths
+        retriever._reset_documents(
+            header.get("doc_ids"),
+            retriever.index.num_docs,
+            arrays.get("deleted"),
+            header.get("next_doc_id"),
+        )
+        retriever.avg_doc_length = header["avg_doc_length"]
+        retriever.idf = arrays["idf"]
+
+        retriever._prepare_scoring()
+        return retriever
+
+    def _build_weight_matrix(self):
+        # Doc-term CSR matrix whose entries are the full BM25 term contributions,
+        # so scoring a query is a single sparse matrix-vector product.
+        # The tf layout is parameter-free and cached on the (immutable) index.
+        if self.backend == "impact":
+            self.weight_matrix = self.impact_index.doc_term_matrix(self.index.num_docs)
+            return
+
+        tf_matrix, tf_rows = self.index.doc_term_rows()
+        tfs = tf_matrix.data
+        weights = tf_matrix.astype(np.float64)
+        weights.data = self.idf[weights.indices] * (
+            (tfs * (self.k1 + 1)) / (tfs + self._length_norm[tf_rows])
+        )
+        self.weight_matrix = weights
+
+    def _query_term_ids(self, query_text):
+        return [
+            self.vocab_map[t] for t in tokenize_query(query_text) if t in self.vocab_map
         ]
-        top_indices = np.argsort(scores)[-k:][::-1]
-        return top_indices
+
+    def _score_query(self, term_ids):
+        if self.backend == "impact":
+            # Sums of integer impacts, exact in float64 for the ranking step.
+            scores, _ = self.impact_index.accumulate(
+                term_ids, self.index.num_docs, self.impact_budget
+            )
+            return scores.astype(np.float64)
+        if self.backend == "sparse":
+            query_vector = np.bincount(term_ids, minlength=len(self.vocab_map))
+            return self.weight_matrix @ query_vector.astype(np.float64)
+
+        scores = np.zeros(self.index.num_docs)
+        for term_id in term_ids:
+            doc_ids, tfs = self.index.postings(term_id)
+            numerator = tfs * (self.k1 + 1)
+            denominator = tfs + self._length_norm[doc_ids]
+            scores[doc_ids] += self.idf[term_id] * (numerator / denominator)
+        return scores
+
+    def _score_documents(self, term_ids, docs):
+        # _score_query of the postings backend, restricted to ``docs``: same
+        # arithmetic and the same term order, so the sums match bit for bit.
+        # The tf of every (term, document) pair comes from one binary search
+        # over the term-major posting keys.
+        terms, rows = np.unique(term_ids, return_inverse=True)
+        posting_keys = self.index.posting_keys()
+        keys = terms[:, None] * self.index.num_docs + docs
+        positions = np.minimum(
+            np.searchsorted(posting_keys, keys), max(len(posting_keys) - 1, 0)
+        )
+        found = posting_keys[positions] == keys
+        tfs = np.where(found, self.index.tfs[positions], 0)
+        with np.errstate(invalid="ignore"):
+            contributions = self.idf[terms][:, None] * (
+                (tfs * (self.k1 + 1)) / (tfs + self._length_norm[docs])
+            )
+        contributions[~found] = 0.0
+
+        # Absent terms add an exact zero.
+        scores = np.zeros(len(docs))
+        for row in rows.tolist():
+            scores += contributions[row]
+        return scores
+
+    def _settle_boundary(self, scores, term_ids, k):
+        # The batch product adds a document's term contributions in another
+        # order than _score_query, which can swap near-ties; documents around
+        # the k-th score are rescored the way a single query scores them.
+        if self._has_deletes:
+            scores[self.deleted] = -np.inf
+        candidates = boundary_candidates(scores, k)
+        scores[candidates] = self._score_documents(term_ids, candidates)
+
+    def _query_matrix(self, queries):
+        rows, cols = [], []
+        for row, query_text in enumerate(queries):
+            term_ids = self._query_term_ids(query_text)
+            rows.extend([row] * len(term_ids))
+            cols.extend(term_ids)
+
+        return csr_matrix(
+            (np.ones(len(cols)), (rows, cols)),
+            shape=(len(queries), len(self.vocab_map)),
+        )
+
+    def _kth_score(self, term_ids, docs, partial, k, threshold):
+        # The exact scores of the k best partial scores: at least k documents
+        # score this much, so it is a k-th score to prune against.
+        if len(docs) < k:
+            return threshold
+        leaders = docs[np.argpartition(partial, len(docs) - k)[-k:]]
+        return max(threshold, self._score_documents(term_ids, leaders).min())
+
+    def _maxscore_candidates(self, term_ids, k):
+        terms, counts = np.unique(term_ids, return_counts=True)
+        bounds = counts * self.upper_bounds[terms]
+        order = np.argsort(bounds, kind="stable")
+        terms, counts = terms[order], counts[order]
+        prefix_bounds = np.cumsum(bounds[order]) + _BOUND_SLACK
+        offsets = self.index.offsets
+        spans = [(offsets[t], offsets[t + 1]) for t in terms.tolist()]
+
+        # A first k-th score from the documents the strongest term favours.
+        start, end = spans[-1]
+        docs = self.index.doc_ids[start:end].astype(np.int64)
+        partial = counts[-1] * self._contributions[start:end]
+        if self._has_deletes:
+            live = ~self.deleted[docs]
+            docs, partial = docs[live], partial[live]
+        threshold = self._kth_score(term_ids, docs, partial, k, -np.inf)
+
+        # Documents outside the postings of the essential terms, terms[first:],
+        # score at most prefix_bounds[first - 1], below the threshold.
+        first = int(np.searchsorted(prefix_bounds, threshold))
+        accumulated = np.zeros(self.index.num_docs)
+        matched = np.zeros(self.index.num_docs, dtype=bool)
+        for count, (start, end) in zip(counts[first:].tolist(), spans[first:]):
+            postings = self.index.doc_ids[start:end]
+            accumulated[postings] += count * self._contributions[start:end]
+            matched[postings] = True
+        rest = prefix_bounds[first - 1] if first else _BOUND_SLACK
+        matched &= accumulated + rest >= threshold
+        if self._has_deletes:
+            matched &= ~self.deleted
+        docs = np.flatnonzero(matched)
+        partial = accumulated[docs]
+        threshold = self._kth_score(term_ids, docs, partial, k, threshold)
+
+        # Non-essential terms, strongest first, for the candidates that can
+        # still reach the k-th score as the bound of the terms left shrinks.
+        for idx in range(first - 1, -1, -1):
+            keep = partial + prefix_bounds[idx] >= threshold
+            docs, partial = docs[keep], partial[keep]
+            start, end = spans[idx]
+            postings = self.index.doc_ids[start:end]
+            positions = np.searchsorted(postings, docs)
+            found = positions < len(postings)
+            found[found] = postings[positions[found]] == docs[found]
+            partial[found] += (
+                counts[idx] * self._contributions[start + positions[found]]
+            )
+        return docs[partial + _BOUND_SLACK >= threshold]
+
+    def _retrieve_top_k_pruned(self, term_ids, k):
+        # MaxScore, term at a time. Terms are ordered by upper bound; a document
+        # matching only the weakest ones scores at most their summed bounds, so
+        # once that sum is below a known k-th score (strictly, so not even a tie
+        # is lost) those terms are non-essential. Candidates come from the
+        # essential postings alone; the non-essential postings are only probed
+        # by binary search for candidates that can still reach the k-th score,
+        # and the few left are scored with the arithmetic of _score_query.
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        docs, scores = np.empty(0, dtype=np.int64), np.empty(0)
+        if term_ids:
+            docs = self._maxscore_candidates(term_ids, k)
+            scores = self._score_documents(term_ids, docs)
+
+        self.pruning_stats["last_docs_evaluated"] = len(docs)
+        self.pruning_stats["docs_evaluated"] += len(docs)
+        instrumentation.count("docs_scored", len(docs))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"MaxScore evaluated {len(docs)} of {self.index.num_docs} documents"
+            )
+
+        # Scored documents are in index order, so top_k_indices keeps the rule
+        # of the higher index first on ties.
+        top_indices = docs[top_k_indices(scores, k)].tolist()
+        if len(top_indices) < k:
+            # Pad with non-matching (zero score) documents, highest index first.
+            matched = set(docs.tolist())
+            for doc_idx in range(self.index.num_docs - 1, -1, -1):
+                if len(top_indices) >= k:
+                    break
+                if doc_idx not in matched and not self.deleted[doc_idx]:
+                    top_indices.append(doc_idx)
+        return np.asarray(top_indices, dtype=np.int64)
+
+    @reads_snapshot
+    def retrieve_top_k(self, query_text: str, k: int = 5):
+        term_ids = self._query_term_ids(query_text)
+        return self._cached_top_k(
+            term_ids, k, lambda: self._retrieve_top_k(term_ids, k)
+        )
+
+    def _retrieve_top_k(self, term_ids, k):
+        instrumentation.count("queries")
+        if self.pruning:
+            # MaxScore selects the top k while scoring.
+            with instrumentation.timer("score"):
+                return self._retrieve_top_k_pruned(term_ids, k)
+
+        with instrumentation.timer("score"):
+            scores = self._score_query(term_ids)
+        instrumentation.count("docs_scored", self.index.num_docs)
+        return self._rank(scores, k)
+
+    @reads_snapshot
+    def retrieve_top_k_with_scores(self, query_text: str, k: int = 5):
+        # Rankings of several indexes (e.g. shards) are merged on these scores;
+        # MaxScore pruning and the result cache are bypassed.
+        term_ids = self._query_term_ids(query_text)
+        scores = self._score_query(term_ids)
+        top_indices = self._rank(scores, k)
+        return top_indices, scores[top_indices]
+
+    @reads_snapshot
+    def retrieve_top_k_batch(self, queries, k: int = 5):
+        queries = list(queries)
+        if self.backend == "impact" and self.impact_budget is not None:
+            # Early termination is per query, so budgeted scoring cannot be
+            # one matrix product.
+            with instrumentation.timer("score"):
+                scores = np.array(
+                    [
+                        self._score_query(self._query_term_ids(query_text))
+                        for query_text in queries
+                    ]
+                ).reshape(len(queries), self.index.num_docs)
+            instrumentation.count("queries", scores.shape[0])
+            instrumentation.count("docs_scored", scores.size)
+            return self._rank_batch(scores, k)
+
+        query_matrix = self._query_matrix(queries)
+        if self.weight_matrix is None:
+            self._build_weight_matrix()
+
+        with instrumentation.timer("score"):
+            scores = (query_matrix @ self.weight_matrix.T).toarray()
+            if self.backend == "postings":
+                for row, query_text in zip(scores, queries):
+                    term_ids = self._query_term_ids(query_text)
+                    if term_ids:
+                        self._settle_boundary(row, term_ids, k)
+        instrumentation.count("queries", scores.shape[0])
+        instrumentation.count("docs_scored", scores.size)
+        return self._rank_batch(scores, k)
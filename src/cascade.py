@@ -0,0 +1,67 @@
+import numpy as np
+
+from .instrumentation import instrumentation
+from .logger import get_logger
+from .utils import tokenize_query, top_k_indices
+
+logger = get_logger(__name__)
+
+
+class CascadeRetriever:
+    """Two-stage retrieval: a cheap first stage proposes ``depth`` candidates
+    per query and a language model reranks only those.
+
+    Both stages must be fitted on the same passages in the same order. The
+    reranker scores candidates with its vectorized ``calculate_scores``, so at
+    a depth covering the whole collection the results equal its own ranking.
+    """
+
+    def __init__(self, first_stage, reranker, depth=None):
+        if first_stage.doc_ids != reranker.doc_ids:
+            msg = "Cascade stages must be fitted on the same passages"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        self.first_stage = first_stage
+        self.reranker = reranker
+        self.depth = reranker.config.cascade_depth if depth is None else depth
+        if self.depth < 1:
+            msg = f"Cascade depth must be positive, got {self.depth}"
+            logger.error(msg)
+            raise ValueError(msg)
+
+    def _query_tokens(self, query_text):
+        return [t for t in tokenize_query(query_text) if t in self.reranker.vocab_map]
+
+    def _rerank(self, query_tokens, candidates, k):
+        # Candidates in index order, so ties keep the usual rule of the higher
+        # index first.
+        candidates = np.sort(candidates[candidates >= 0])
+        with instrumentation.timer("rerank"):
+            scores = self.reranker._current_snapshot().calculate_scores(
+                query_tokens, candidates
+            )
+        instrumentation.count("docs_reranked", len(candidates))
+        return candidates[top_k_indices(scores, k)]
+
+    def retrieve_top_k(self, query_text: str, k: int = 5):
+        # Queries the reranker cannot score get no results, as with the
+        # language models on their own.
+        query_tokens = self._query_tokens(query_text)
+        if not query_tokens:
+            return np.array([])
+
+        candidates = self.first_stage.retrieve_top_k(query_text, k=self.depth)
+        return self._rerank(query_tokens, np.asarray(candidates, dtype=np.int64), k)
+
+    def retrieve_top_k_batch(self, queries, k: int = 5):
+        queries = list(queries)
+        candidates = self.first_stage.retrieve_top_k_batch(queries, k=self.depth)
+
+        top_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, query_text in enumerate(queries):
+            query_tokens = self._query_tokens(query_text)
+            if query_tokens:
+                reranked = self._rerank(query_tokens, candidates[row], k)
+                top_indices[row, : len(reranked)] = reranked
+        return top_indices
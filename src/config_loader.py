@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from typing import Any, Dict
 
@@ -9,13 +10,24 @@ logger = get_logger(__name__)
 
 
 class AppConfig:
-    CONFIG_FILE = "./config/config.yaml"
+    # The shared configuration comes from $IR_CONFIG when set, otherwise from
+    # the repository's config.yaml regardless of the working directory.
+    CONFIG_FILE = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+    CONFIG_ENV = "IR_CONFIG"
     _instance = None
 
-    def __new__(cls):
+    def __new__(cls, config_path=None):
+        # An explicit path gives an independent configuration that can be
+        # injected into retrievers and tools; ``AppConfig()`` is the singleton.
+        if config_path is not None:
+            config = super().__new__(cls)
+            config._load_config(config_path)
+            return config
+
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._load_config()
+            config = super().__new__(cls)
+            config._load_config(os.environ.get(cls.CONFIG_ENV, cls.CONFIG_FILE))
+            cls._instance = config
         return cls._instance
 
     @staticmethod
@@ -34,12 +46,20 @@ class AppConfig:
             logger.error(f"Error reading config file: {e}")
             raise
 
-    def _load_config(self) -> None:
-        config = self._read_config(self.CONFIG_FILE)
+    @classmethod
+    def _resolve(cls, path) -> Path:
+        # Relative paths in the config are relative to the project root, not to
+        # the working directory.
+        path = Path(path)
+        return path if path.is_absolute() else cls.CONFIG_FILE.parents[1] / path
+
+    def _load_config(self, config_path) -> None:
+        self.config_path = Path(config_path)
+        config = self._read_config(config_path)
 
         # --- Data ingestion ---
         ingestion_cfg = config["data_ingestion"]
-        self.data_root = Path(ingestion_cfg["root_dir"])
+        self.data_root = self._resolve(ingestion_cfg["root_dir"])
 
         datasets = ingestion_cfg["datasets"]
         train_cfg = datasets["train"]
@@ -60,22 +80,64 @@ class AppConfig:
         self.val_questions_path = self.data_root / val_cfg["questions"]
 
         # Stopwords
-        self.stopwords_path = Path(ingestion_cfg["stopwords_path"])
+        self.stopwords_path = self._resolve(ingestion_cfg["stopwords_path"])
+        self.query_cache_size = ingestion_cfg["query_cache_size"]
 
         # --- Vocabulary ---
         vocab_cfg = config["vocabulary_settings"]
         self.vocab_size = vocab_cfg["vocab_size"]
 
-        self.vocab_dir = Path(vocab_cfg["vocab_dir"])
-        self.vocab_dir.mkdir(parents=True, exist_ok=True)
-
+        self.vocab_dir = self._resolve(vocab_cfg["vocab_dir"])
         self.tokens_path = self.vocab_dir / vocab_cfg["tokens"]
 
+        # --- Hyperparameter Tuning ---
+        tuning_cfg = config["tuning_settings"]
+        self.tuning_strategy = tuning_cfg["strategy"]
+        self.tuning_workers = tuning_cfg["workers"]
+        self.tuning_num_trials = tuning_cfg["num_trials"]
+        self.tuning_eta = tuning_cfg["eta"]
+        self.tuning_seed = tuning_cfg["seed"]
+        self.trial_log_dir = self._resolve(tuning_cfg["trial_log_dir"])
+
+        # --- Saved Indexes ---
+        index_cfg = config["index_settings"]
+        self.index_dir = self._resolve(index_cfg["index_dir"])
+        self.indexing_workers = index_cfg["indexing_workers"]
+        self.compaction_ratio = index_cfg["compaction_ratio"]
+
+        # --- Cascade Retrieval ---
+        cascade_cfg = config["cascade_settings"]
+        self.cascade_depth = cascade_cfg["depth"]
+        self.cascade_report_depths = cascade_cfg["report_depths"]
+
+        # --- Result Cache ---
+        cache_cfg = config["result_cache"]
+        self.result_cache_enabled = cache_cfg["enabled"]
+        self.result_cache_max_entries = cache_cfg["max_entries"]
+        self.result_cache_max_bytes = cache_cfg["max_bytes"]
+        self.result_cache_ttl = cache_cfg["ttl_seconds"]
+
+        # --- Retrieval Server ---
+        server_cfg = config["server_settings"]
+        self.server_model = server_cfg["model"]
+        self.server_host = server_cfg["host"]
+        self.server_port = server_cfg["port"]
+        self.server_unix_socket = server_cfg["unix_socket"]
+        self.batch_window_ms = server_cfg["batch_window_ms"]
+        self.max_batch_size = server_cfg["max_batch_size"]
+        self.server_executor = server_cfg["executor"]
+        self.server_workers = server_cfg["workers"]
+        self.max_body_bytes = server_cfg["max_body_bytes"]
+
+        # --- Instrumentation ---
+        instrumentation_cfg = config["instrumentation"]
+        self.instrumentation_enabled = instrumentation_cfg["enabled"]
+        self.profile_mode = instrumentation_cfg["profile"]
+        self.profile_dir = self._resolve(instrumentation_cfg["report_dir"])
+
         # --- Image Retriever ---
         image_cfg = config["image_settings"]
-        self.imgs_dir = Path(image_cfg["imgs_dir"])
-        self.imgs_dir.mkdir(parents=True, exist_ok=True)
-
+        self.imgs_dir = self._resolve(image_cfg["imgs_dir"])
         self.results_plot = self.imgs_dir / image_cfg["results_plot"]
 
         logger.info("Configuration loaded successfully.")
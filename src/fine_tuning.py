@@ -1,11 +1,11 @@
-from itertools import product
-
 import numpy as np
 
 from .bm25_retriever import BM25Retriever
 from .language_retriever import BigramRetriever, UnigramRetriever
 from .logger import get_logger
 from .metrics import Evaluator
+from .tokenized_corpus import as_corpus
+from .tuning import HyperparameterTuner
 
 logger = get_logger(__name__)
 
@@ -16,63 +16,92 @@ BM25_B_RANGE = np.linspace(0.5, 1.0, num=5).tolist()
 UNIGRAM_MU_RANGE = [500, 1000, 1500, 2000, 3000]
 BIGRAM_LAMBDA_RANGE = np.linspace(0.1, 0.9, num=9).tolist()
 
+# --- Random Search Spaces: (low, high) is sampled uniformly, lists as choices ---
+BM25_RANDOM_SPACE = {"k1": (1.2, 2.0), "b": (0.5, 1.0)}
+UNIGRAM_RANDOM_SPACE = {"mu": UNIGRAM_MU_RANGE}
+BIGRAM_RANDOM_SPACE = {"lambda_": (0.1, 0.9)}
+
+
+def _search(
+    config,
+    model,
+    name,
+    val_passage,
+    val_questions,
+    val_judgments,
+    grid_space,
+    random_space,
+    fixed_params=None,
+):
+    tuner = HyperparameterTuner(
+        model,
+        Evaluator(val_judgments),
+        val_questions,
+        val_passage,
+        workers=config.tuning_workers,
+        trial_log=config.trial_log_dir / f"{name}_trials.json",
+        seed=config.tuning_seed,
+    )
+    strategy = config.tuning_strategy
+    best_params, _ = tuner.search(
+        random_space if strategy == "random" else grid_space,
+        strategy=strategy,
+        num_trials=config.tuning_num_trials,
+        eta=config.tuning_eta,
+        fixed_params=fixed_params,
+    )
+    return best_params
+
 
 def fine_tune_bm25(config, train_passage, val_passage, val_questions, val_judgments):
     logger.info("Starting BM25 Fine-Tuning")
-    evaluator = Evaluator(val_judgments)
-    best_map = -1
-    best_params = {}
+    model = BM25Retriever(config)
+    model.fit(as_corpus(train_passage))
 
-    for k1, b in product(BM25_K1_RANGE, BM25_B_RANGE):
-        model = BM25Retriever(config, k1=k1, b=b)
-        model.fit(train_passage)
-        results = evaluator.evaluate_model(model, val_questions, val_passage)
-
-        logger.info(f"BM25 [k1={k1:.2f}, b={b:.2f}] -> MAP: {results['MAP']:.4f}")
-        if results["MAP"] > best_map:
-            best_map = results["MAP"]
-            best_params = {"k1": k1, "b": b}
-
-    return best_params
+    return _search(
+        config,
+        model,
+        "bm25",
+        val_passage,
+        val_questions,
+        val_judgments,
+        {"k1": BM25_K1_RANGE, "b": BM25_B_RANGE},
+        BM25_RANDOM_SPACE,
+    )
 
 
 def fine_tune_unigram(config, train_passage, val_passage, val_questions, val_judgments):
     logger.info("Starting Unigram Fine-Tuning")
-    evaluator = Evaluator(val_judgments)
-    best_map = -1
-    best_mu = 1000
+    model = UnigramRetriever(config, mu=1000)
+    model.fit(as_corpus(train_passage))
 
-    for mu in UNIGRAM_MU_RANGE:
-        model = UnigramRetriever(config, mu=mu)
-        model.fit(train_passage)
-
-        results = evaluator.evaluate_model(model, val_questions, val_passage)
-        logger.info(f"Unigram [mu={mu}] -> MAP: {results['MAP']:.4f}")
-
-        if results["MAP"] > best_map:
-            best_map = results["MAP"]
-            best_mu = mu
-
-    return {"mu": best_mu}
+    return _search(
+        config,
+        model,
+        "unigram",
+        val_passage,
+        val_questions,
+        val_judgments,
+        {"mu": UNIGRAM_MU_RANGE},
+        UNIGRAM_RANDOM_SPACE,
+    )
 
 
 def fine_tune_bigram(
     config, train_passage, val_passage, val_questions, val_judgments, best_mu
 ):
     logger.info(f"Starting Bigram Fine-Tuning using fixed mu={best_mu}")
-    evaluator = Evaluator(val_judgments)
-    best_map = -1
-    best_lambda = 0.5
-
-    for lambda_ in BIGRAM_LAMBDA_RANGE:
-        model = BigramRetriever(config, mu=best_mu, lambda_=lambda_)
-        model.fit(train_passage)
-
-        results = evaluator.evaluate_model(model, val_questions, val_passage)
-        logger.info(f"Bigram [lambda={lambda_:.2f}] -> MAP: {results['MAP']:.4f}")
-
-        if results["MAP"] > best_map:
-            best_map = results["MAP"]
-            best_lambda = lambda_
-
-    return {"mu": best_mu, "lambda_": best_lambda}
+    model = BigramRetriever(config, mu=best_mu)
+    model.fit(as_corpus(train_passage))
+
+    return _search(
+        config,
+        model,
+        "bigram",
+        val_passage,
+        val_questions,
+        val_judgments,
+        {"lambda_": BIGRAM_LAMBDA_RANGE},
+        BIGRAM_RANDOM_SPACE,
+        fixed_params={"mu": best_mu},
+    )
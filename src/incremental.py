@@ -0,0 +1,262 @@
+import copy
+import functools
+import itertools
+import threading
+
+import numpy as np
+
+from .instrumentation import instrumentation
+from .logger import get_logger
+from .tokenized_corpus import as_corpus
+from .utils import top_k_indices, top_k_indices_batch
+
+logger = get_logger(__name__)
+
+# Process-wide index versions: every fit, load and update gets a fresh one, so
+# cached results never outlive the index they were computed on.
+_index_versions = itertools.count()
+
+
+def _after_numeric_ids(doc_ids, start):
+    # First id counter value past ``start`` and every numeric id in use, so
+    # minted ids never repeat one of them.
+    return max([start] + [int(doc_id) + 1 for doc_id in doc_ids if doc_id.isdecimal()])
+
+
+def reads_snapshot(method):
+    # Runs a query method on the generation published when it was called, so
+    # scoring needs no lock and never sees a half-applied update.
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return method(self._current_snapshot(), *args, **kwargs)
+
+    return wrapper
+
+
+class UpdatableIndex:
+    """Adds, tombstone deletes and compaction for a fitted retriever.
+
+    Every update is built on a shallow copy of the retriever that is never
+    modified once published. Query methods (``reads_snapshot``) take the
+    current copy and score on it without locking, so a query always sees a
+    single consistent generation of the index. Deleted documents stay in the
+    arrays as tombstones, excluded from statistics and results, until
+    ``compact`` (run automatically past ``config.compaction_ratio``) drops them.
+    An optional ``ResultCache`` answers repeated ``retrieve_top_k`` calls.
+    """
+
+    def __init__(self, result_cache=None):
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self.result_cache = result_cache
+        self.index_version = next(_index_versions)
+        self.generation = 0
+        self.doc_ids = []
+        self.deleted = np.zeros(0, dtype=bool)
+        self._has_deletes = False
+        self._positions = None
+        # Collection statistics of a larger collection (e.g. summed over
+        # shards) that replace this index's own when set.
+        self.shared_statistics = None
+        # The published generation queries run on; ``None`` until the first
+        # query after fit, load or set_params copies this object.
+        self._snapshot = None
+
+    def _reset_documents(self, doc_ids, num_docs, deleted=None, next_doc_id=None):
+        # Passages without ids are identified by their position in the corpus.
+        self.doc_ids = (
+            [str(doc_id) for doc_id in doc_ids]
+            if doc_ids is not None
+            else [str(idx) for idx in range(num_docs)]
+        )
+        self.deleted = (
+            np.array(deleted, dtype=bool)
+            if deleted is not None
+            else np.zeros(num_docs, dtype=bool)
+        )
+        self._has_deletes = bool(self.deleted.any())
+        self._positions = None
+        # Passages added without ids are numbered from this counter, which only
+        # grows, so compaction never frees an id for reuse.
+        self.next_doc_id = (
+            _after_numeric_ids(self.doc_ids, 0) if next_doc_id is None else next_doc_id
+        )
+        self.index_version = next(_index_versions)
+        self._snapshot = None
+
+    @property
+    def num_live_docs(self):
+        return len(self.deleted) - int(self.deleted.sum())
+
+    def add_documents(self, passages, workers: int = 1):
+        # Re-adding a live doc id replaces it: the old copy becomes a tombstone.
+        corpus = as_corpus(passages, workers=workers)
+
+        with self._update_lock:
+            start = self.next_doc_id
+            doc_ids = (
+                [str(doc_id) for doc_id in corpus.doc_ids]
+                if corpus.doc_ids is not None
+                else [str(idx) for idx in range(start, start + len(corpus))]
+            )
+            replaced = [
+                self._live_positions()[doc_id]
+                for doc_id in doc_ids
+                if doc_id in self._live_positions()
+            ]
+            updated = copy.copy(self)
+            updated._append_corpus(corpus)
+            updated.doc_ids = self.doc_ids + doc_ids
+            updated.next_doc_id = _after_numeric_ids(doc_ids, start)
+            updated.deleted = np.concatenate(
+                [self.deleted, np.zeros(len(corpus), dtype=bool)]
+            )
+            updated.deleted[replaced] = True
+            updated.source_checksum = None
+            self._publish(updated)
+
+        logger.info(
+            f"Documents added | added={len(corpus)}, replaced={len(replaced)}, "
+            f"live={self.num_live_docs}"
+        )
+
+    def delete_documents(self, doc_ids):
+        with self._update_lock:
+            positions = self._live_positions()
+            missing = [doc_id for doc_id in doc_ids if str(doc_id) not in positions]
+            if missing:
+                msg = f"Cannot delete unknown documents: {missing[:10]}"
+                logger.error(msg)
+                raise ValueError(msg)
+
+            updated = copy.copy(self)
+            updated.deleted = self.deleted.copy()
+            updated.deleted[[positions[str(doc_id)] for doc_id in doc_ids]] = True
+            updated.source_checksum = None
+            self._publish(updated)
+
+        logger.info(
+            f"Documents deleted | deleted={len(doc_ids)}, live={self.num_live_docs}"
+        )
+
+    def set_collection_statistics(self, statistics):
+        # ``None`` restores the index's own statistics. Shared statistics are
+        # kept as they are across updates of this index.
+        with self._update_lock:
+            updated = copy.copy(self)
+            updated.shared_statistics = statistics
+            self._publish(updated, compact=False)
+
+    def compact(self):
+        with self._update_lock:
+            updated = copy.copy(self)
+            updated._compact()
+            self._publish(updated, compact=False)
+
+    def _compact(self):
+        keep = np.flatnonzero(~self.deleted)
+        removed = len(self.deleted) - len(keep)
+        self._compact_rows(keep)
+        self.doc_ids = [self.doc_ids[idx] for idx in keep.tolist()]
+        self.deleted = np.zeros(len(keep), dtype=bool)
+        logger.info(f"Index compacted | removed={removed}, live={len(keep)}")
+
+    def _publish(self, updated, compact=True):
+        # Statistics are refreshed on the copy, so queries keep reading the
+        # previous generation until ``_snapshot`` points to the new one.
+        num_docs = len(updated.deleted)
+        if (
+            compact
+            and num_docs
+            and updated.deleted.sum() / num_docs > self.config.compaction_ratio
+        ):
+            updated._compact()
+
+        updated._has_deletes = bool(updated.deleted.any())
+        updated._positions = None
+        updated._refresh_statistics()
+        updated.index_version = next(_index_versions)
+        updated._snapshot = updated
+        with self._lock:
+            updated.generation = self.generation + 1
+            self.__dict__.update(updated.__dict__)
+
+    def _current_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Queries never run on this object itself, which _publish updates
+            # in place.
+            with self._lock:
+                if self._snapshot is None:
+                    snapshot = copy.copy(self)
+                    snapshot._snapshot = snapshot
+                    self._snapshot = snapshot
+                snapshot = self._snapshot
+        return snapshot
+
+    def _live_positions(self):
+        if self._positions is None:
+            self._positions = {
+                doc_id: idx
+                for idx, doc_id in enumerate(self.doc_ids)
+                if not self.deleted[idx]
+            }
+        return self._positions
+
+    def _cached_top_k(self, query_terms, k, retrieve):
+        # ``query_terms`` is the query after tokenization and vocabulary
+        # filtering, which is all the scoring depends on.
+        if self.result_cache is None:
+            return retrieve()
+
+        key = (
+            type(self).__name__,
+            self.index_version,
+            tuple(sorted(self.get_params().items())),
+            tuple(query_terms),
+            k,
+        )
+        top_indices = self.result_cache.get(key)
+        if top_indices is None:
+            top_indices = retrieve()
+            self.result_cache.put(key, top_indices)
+        return top_indices
+
+    def _rank(self, scores, k):
+        with instrumentation.timer("top_k"):
+            if not self._has_deletes:
+                return top_k_indices(scores, k)
+
+            # Ranked among live documents only: a tombstone masked to -inf would
+            # still tie with live documents scoring -inf and take their place.
+            live = np.flatnonzero(~self.deleted)
+            return live[top_k_indices(scores[live], k)]
+
+    def _rank_batch(self, scores, k):
+        with instrumentation.timer("top_k"):
+            if not self._has_deletes:
+                return top_k_indices_batch(scores, k)
+
+            # Rows keep min(k, num_docs) columns, padded with -1 past the live
+            # documents.
+            live = np.flatnonzero(~self.deleted)
+            top_indices = np.full(
+                (scores.shape[0], min(k, scores.shape[1])), -1, dtype=np.int64
+            )
+            live_top = top_k_indices_batch(scores[:, live], k)
+            top_indices[:, : live_top.shape[1]] = live[live_top]
+            return top_indices
+
+    def _append_corpus(self, corpus):
+        raise NotImplementedError("Child class must implement this")
+
+    def _compact_rows(self, keep):
+        raise NotImplementedError("Child class must implement this")
+
+    def collection_statistics(self):
+        # Live-document counts the scoring statistics derive from; summing them
+        # over shards gives the statistics of the whole collection.
+        raise NotImplementedError("Child class must implement this")
+
+    def _refresh_statistics(self):
+        raise NotImplementedError("Child class must implement this")
@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+
+
+def update_checksum(digest, text):
+    digest.update(str(text).encode("utf-8"))
+    digest.update(b"\0")
+
+
+def passages_checksum(passages):
+    # Takes anything ``fit`` does (a TokenizedCorpus, a passages DataFrame, or
+    # (doc_id, text) pairs or texts), so a load checks the same passages a fit
+    # would index. Imported here: tokenized_corpus imports this module.
+    from .tokenized_corpus import as_corpus
+
+    return as_corpus(passages).checksum
+
+
+def save_index(path, header, arrays):
+    index_dir = Path(path)
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    for name, array in arrays.items():
+        np.save(index_dir / f"{name}.npy", np.ascontiguousarray(array))
+
+    # The header is written last, so an interrupted save is never loadable.
+    header = {"format_version": FORMAT_VERSION, **header, "arrays": sorted(arrays)}
+    with open(index_dir / HEADER_FILE, "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False)
+
+    logger.info(f"Index saved | model='{header['model']}', path='{index_dir}'")
+
+
+def load_index(path, model, passages=None, mmap_mode="r"):
+    index_dir = Path(path)
+    header_path = index_dir / HEADER_FILE
+
+    if not header_path.exists():
+        msg = f"No saved index found at '{index_dir}'"
+        logger.error(msg)
+        raise FileNotFoundError(msg)
+
+    with open(header_path, "r", encoding="utf-8") as f:
+        header = json.load(f)
+
+    if header.get("format_version") != FORMAT_VERSION:
+        msg = (
+            f"Unsupported index format version {header.get('format_version')} "
+            f"at '{index_dir}', expected {FORMAT_VERSION}"
+        )
+        logger.error(msg)
+        raise ValueError(msg)
+
+    if header["model"] != model:
+        msg = f"Index at '{index_dir}' holds a '{header['model']}' model, not '{model}'"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    if passages is not None and passages_checksum(passages) != header["checksum"]:
+        msg = f"Index at '{index_dir}' is stale: source passages have changed"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    arrays = {
+        name: np.load(index_dir / f"{name}.npy", mmap_mode=mmap_mode)
+        for name in header["arrays"]
+    }
+    logger.info(f"Index loaded | model='{model}', path='{index_dir}'")
+    return header, arrays
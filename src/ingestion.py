@@ -0,0 +1,105 @@
+import json
+from pathlib import Path
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 1 << 16
+_WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(path, chunk_size: int = CHUNK_SIZE):
+    # Yields the elements of a top-level JSON array while holding only the
+    # current element plus one read chunk in memory.
+    decoder = json.JSONDecoder()
+
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+
+        def refill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+        def next_char():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if eof:
+                    msg = f"Unexpected end of JSON array in '{path}'"
+                    logger.error(msg)
+                    raise json.JSONDecodeError(msg, buffer, pos)
+                refill()
+
+        if next_char() != "[":
+            msg = f"Expected a JSON array in '{path}'"
+            logger.error(msg)
+            raise json.JSONDecodeError(msg, buffer, pos)
+        pos += 1
+
+        expect_value, empty = True, True
+        while True:
+            char = next_char()
+            if not expect_value:
+                if char == "]":
+                    return
+                if char != ",":
+                    msg = f"Expected ',' or ']' in '{path}' at offset {pos}"
+                    logger.error(msg)
+                    raise json.JSONDecodeError(msg, buffer, pos)
+                pos += 1
+                expect_value = True
+                continue
+            if char == "]" and empty:
+                return
+
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    logger.error(f"Invalid JSON element in '{path}' at offset {pos}")
+                    raise
+                refill()
+                continue
+
+            # A value cut at a chunk boundary can still decode (e.g. "12" of
+            # "123"), so only accept it once a delimiter is in the buffer.
+            after = end
+            while after < len(buffer) and buffer[after] in _WHITESPACE:
+                after += 1
+            if not eof and (after == len(buffer) or buffer[after] not in ",]"):
+                refill()
+                continue
+
+            pos = end
+            expect_value, empty = False, False
+            yield value
+
+
+def iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.error(f"Invalid JSON on line {line_number} of '{path}': {e}")
+                raise
+
+
+def iter_records(path):
+    if Path(path).suffix == ".jsonl":
+        return iter_jsonl(path)
+    return iter_json_array(path)
+
+
+def iter_passages(path):
+    for record in iter_records(path):
+        yield str(record["doc_id"]), record["passage_text"]
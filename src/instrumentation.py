@@ -0,0 +1,194 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+from .logger import get_logger
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = get_logger(__name__)
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+# Returned by ``timer`` while instrumentation is off, so a disabled stage costs
+# one attribute check.
+_NULL_TIMER = nullcontext()
+
+
+class _StageTimer:
+    __slots__ = ("instrumentation", "stage", "start")
+
+    def __init__(self, instrumentation, stage):
+        self.instrumentation = instrumentation
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.instrumentation._record(self.stage, time.perf_counter() - self.start)
+
+
+class Instrumentation:
+    """Process-wide stage timers and counters for fit, retrieve and evaluate.
+
+    Disabled by default; ``configure`` switches it on from ``config.yaml``.
+    Stages recorded in pool workers (parallel tuning or serving) stay in those
+    processes and are not part of this process' report.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def configure(self, config):
+        self.enabled = config.instrumentation_enabled
+
+    def reset(self):
+        with self._lock:
+            self.seconds = defaultdict(float)
+            self.calls = Counter()
+            self.counters = Counter()
+            self.traced_peak = None
+            self.started = time.perf_counter()
+
+    def timer(self, stage):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, stage)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += value
+
+    def _record(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    def report(self):
+        with self._lock:
+            counters = dict(self.counters)
+            stages = {
+                stage: {
+                    "seconds": round(seconds, 6),
+                    "calls": self.calls[stage],
+                    "ms_per_call": round(seconds * 1000 / self.calls[stage], 4),
+                }
+                for stage, seconds in sorted(self.seconds.items())
+            }
+
+        queries = counters.get("queries", 0)
+        lookups = counters.get("cache_hits", 0) + counters.get("cache_misses", 0)
+        report = {
+            "wall_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": stages,
+            "counters": counters,
+            "docs_scored_per_query": (
+                counters.get("docs_scored", 0) / queries if queries else None
+            ),
+            "cache_hit_rate": (
+                counters.get("cache_hits", 0) / lookups if lookups else None
+            ),
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+        if self.traced_peak is not None:
+            report["traced_peak_mb"] = round(self.traced_peak / 2**20, 2)
+        return report
+
+    def write_report(self, output_dir):
+        report = self.report()
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f"run_{datetime.now():%Y%m%d_%H%M%S}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        logger.info(f"Instrumentation report saved to '{path}'")
+        return report, path
+
+
+def format_report(report):
+    lines = [f"{'stage':<20}{'calls':>10}{'seconds':>12}{'ms/call':>12}"]
+    for stage, row in report["stages"].items():
+        lines.append(
+            f"{stage:<20}{row['calls']:>10}{row['seconds']:>12.3f}"
+            f"{row['ms_per_call']:>12.3f}"
+        )
+    if report["docs_scored_per_query"] is not None:
+        lines.append(f"docs scored/query: {report['docs_scored_per_query']:.1f}")
+    if report["cache_hit_rate"] is not None:
+        lines.append(f"cache hit rate:    {report['cache_hit_rate']:.1%}")
+    if report["peak_rss_mb"] is not None:
+        lines.append(f"peak RSS:          {report['peak_rss_mb']:.1f} MB")
+    if "traced_peak_mb" in report:
+        lines.append(f"traced peak:       {report['traced_peak_mb']:.1f} MB")
+    return "\n".join(lines)
+
+
+@contextmanager
+def profiling(mode, output_dir):
+    # Captures a cProfile or tracemalloc profile of the enclosed block; a
+    # ``None`` mode runs it untouched.
+    if mode is None:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        msg = f"Unknown profile mode '{mode}', expected one of {PROFILE_MODES}"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = output_dir / f"{mode}_{datetime.now():%Y%m%d_%H%M%S}"
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{stem}.prof")
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(
+                40
+            )
+            Path(f"{stem}.txt").write_text(summary.getvalue(), encoding="utf-8")
+    else:
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            instrumentation.traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            top_stats = snapshot.statistics("lineno")[:40]
+            Path(f"{stem}.txt").write_text(
+                "\n".join(str(stat) for stat in top_stats), encoding="utf-8"
+            )
+
+    logger.info(f"Profile ({mode}) saved to '{stem}.*'")
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,300 @@
+import numpy as np
+from scipy.sparse import csc_matrix
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class InvertedIndex:
+    """Term -> postings index stored as flat, term-ordered NumPy arrays.
+
+    The postings of term id ``t`` live in ``doc_ids[offsets[t]:offsets[t + 1]]``
+    (ascending document order) with the matching frequencies in ``tfs``.
+    """
+
+    def __init__(self, doc_lengths, offsets, doc_ids, tfs):
+        self.doc_lengths = doc_lengths
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self._doc_term = None
+        self._posting_keys = None
+
+    @classmethod
+    def from_corpus(cls, corpus, vocab_map):
+        doc_lengths = corpus.doc_lengths
+        term_ids = corpus.vocab_token_ids(vocab_map)
+        doc_idx = corpus.doc_index_per_token()
+
+        in_vocab = term_ids >= 0
+        num_docs = max(len(corpus), 1)
+        # Unique (term, doc) keys come out term-major with ascending documents,
+        # which is exactly the postings order.
+        keys, tfs = np.unique(
+            term_ids[in_vocab] * num_docs + doc_idx[in_vocab], return_counts=True
+        )
+        posting_terms = keys // num_docs
+
+        offsets = np.zeros(len(vocab_map) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(posting_terms, minlength=len(vocab_map)), out=offsets[1:])
+
+        logger.debug(
+            f"Inverted index built | docs={len(doc_lengths)}, postings={len(keys)}"
+        )
+        return cls(
+            doc_lengths.astype(np.int64),
+            offsets,
+            (keys % num_docs).astype(np.int32),
+            tfs.astype(np.int32),
+        )
+
+    @property
+    def num_docs(self):
+        return len(self.doc_lengths)
+
+    @property
+    def num_terms(self):
+        return len(self.offsets) - 1
+
+    @property
+    def doc_freqs(self):
+        return np.diff(self.offsets)
+
+    def posting_terms(self):
+        return np.repeat(np.arange(self.num_terms), self.doc_freqs)
+
+    def posting_keys(self):
+        # ``term * num_docs + doc`` per posting, ascending as the postings are
+        # term-major; built once, like doc_term_rows.
+        if self._posting_keys is None:
+            self._posting_keys = (
+                self.posting_terms() * self.num_docs + self.doc_ids
+            ).astype(np.int64)
+        return self._posting_keys
+
+    def postings(self, term_id):
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def doc_term_matrix(self):
+        # The term-ordered postings are exactly the CSC layout of the matrix.
+        term_doc = csc_matrix(
+            (self.tfs, self.doc_ids, self.offsets),
+            shape=(self.num_docs, self.num_terms),
+        )
+        return term_doc.tocsr()
+
+    def doc_term_rows(self):
+        # The doc-term matrix and the row of each stored entry, built once: the
+        # index is never modified, so every retriever sharing it reuses them.
+        if self._doc_term is None:
+            matrix = self.doc_term_matrix()
+            rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+            self._doc_term = (matrix, rows)
+        return self._doc_term
+
+    def append(self, other):
+        # Documents of ``other`` are numbered after ours, so a stable sort by
+        # term keeps every postings list in ascending document order.
+        order = np.argsort(
+            np.concatenate([self.posting_terms(), other.posting_terms()]),
+            kind="stable",
+        )
+        doc_ids = np.concatenate([self.doc_ids, other.doc_ids + self.num_docs])
+        tfs = np.concatenate([self.tfs, other.tfs])
+        return InvertedIndex(
+            np.concatenate([self.doc_lengths, other.doc_lengths]),
+            self.offsets + other.offsets,
+            doc_ids[order].astype(np.int32),
+            tfs[order],
+        )
+
+    def select(self, keep):
+        # Keeps the (ascending) document positions in ``keep`` and renumbers them.
+        new_ids = np.full(self.num_docs, -1, dtype=np.int64)
+        new_ids[keep] = np.arange(len(keep))
+        doc_ids = new_ids[self.doc_ids]
+        kept = doc_ids >= 0
+
+        offsets = np.zeros(self.num_terms + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.posting_terms()[kept], minlength=self.num_terms),
+            out=offsets[1:],
+        )
+        return InvertedIndex(
+            self.doc_lengths[keep],
+            offsets,
+            doc_ids[kept].astype(np.int32),
+            self.tfs[kept],
+        )
+
+
+class PairIndex:
+    """Bigram pair -> postings index over the pairs that actually occur.
+
+    ``keys`` holds the sorted pair keys (``id1 * V + id2``); the postings of
+    ``keys[i]`` are ``doc_ids[offsets[i]:offsets[i + 1]]`` (ascending document
+    order) with the matching pair counts in ``counts``.
+    """
+
+    def __init__(self, keys, offsets, doc_ids, counts):
+        self.keys = keys
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.counts = counts
+
+    @classmethod
+    def from_matrix(cls, doc_pair_matrix):
+        # The doc -> pair CSR rows, regrouped by pair key; a stable sort keeps
+        # the documents of each pair ascending.
+        rows = np.repeat(
+            np.arange(doc_pair_matrix.shape[0]), np.diff(doc_pair_matrix.indptr)
+        )
+        order = np.argsort(doc_pair_matrix.indices, kind="stable")
+        pair_keys = doc_pair_matrix.indices[order]
+        keys, starts = np.unique(pair_keys, return_index=True)
+
+        logger.debug(f"Pair index built | pairs={len(keys)}, postings={len(order)}")
+        return cls(
+            keys,
+            np.append(starts, len(pair_keys)),
+            rows[order].astype(np.int32),
+            doc_pair_matrix.data[order],
+        )
+
+    @property
+    def num_pairs(self):
+        return len(self.keys)
+
+    def postings(self, key):
+        pos = np.searchsorted(self.keys, key)
+        if pos == len(self.keys) or self.keys[pos] != key:
+            return self.doc_ids[:0], self.counts[:0]
+        start, end = self.offsets[pos], self.offsets[pos + 1]
+        return self.doc_ids[start:end], self.counts[start:end]
+
+    def gather(self, keys):
+        # Concatenated postings of many keys at once: for each posting, the
+        # position of its key in ``keys``, the document and the pair count.
+        keys = np.asarray(keys, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.keys, keys), max(self.num_pairs - 1, 0))
+        found = self.keys[pos] == keys if self.num_pairs else np.zeros(len(keys), bool)
+
+        starts = self.offsets[pos[found]]
+        lengths = self.offsets[pos[found] + 1] - starts
+        key_positions = np.repeat(np.flatnonzero(found), lengths)
+        postings = np.arange(lengths.sum()) + np.repeat(
+            starts - (np.cumsum(lengths) - lengths), lengths
+        )
+        return key_positions, self.doc_ids[postings], self.counts[postings]
+
+
+class ImpactIndex:
+    """Term -> postings index of quantized BM25 contributions, impact-ordered.
+
+    The postings of term id ``t`` span ``offsets[t]:offsets[t + 1]`` as in
+    ``InvertedIndex``, but sorted by descending ``impacts`` (unsigned integers
+    of ``bits`` bits, ``round(contribution * scale)``). ``segment_starts`` marks
+    where each run of equal impact begins, the unit of score-at-a-time
+    processing.
+    """
+
+    DTYPES = {8: np.uint8, 16: np.uint16}
+
+    def __init__(self, offsets, doc_ids, impacts, scale):
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.impacts = impacts
+        self.scale = scale
+
+        boundaries = np.ones(len(impacts), dtype=bool)
+        boundaries[1:] = impacts[1:] != impacts[:-1]
+        boundaries[offsets[1:-1][offsets[1:-1] < len(impacts)]] = True
+        self.segment_starts = np.flatnonzero(boundaries)
+
+    @classmethod
+    def from_postings(cls, index, contributions, bits=8):
+        if bits not in cls.DTYPES:
+            msg = f"Unsupported impact width {bits}, expected one of {list(cls.DTYPES)}"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        # One global scale keeps impacts of different terms additive. Every
+        # posting keeps at least 1, so matching documents still outrank the rest.
+        max_impact = (1 << bits) - 1
+        max_contribution = contributions.max() if len(contributions) else 0.0
+        scale = max_impact / max_contribution if max_contribution > 0 else 1.0
+        impacts = np.clip(np.rint(contributions * scale), 1, max_impact)
+
+        order = np.lexsort((index.doc_ids, -impacts, index.posting_terms()))
+        logger.debug(
+            f"Impact index built | bits={bits}, postings={len(order)}, "
+            f"scale={scale:.4f}"
+        )
+        return cls(
+            index.offsets,
+            index.doc_ids[order],
+            impacts[order].astype(cls.DTYPES[bits]),
+            scale,
+        )
+
+    def accumulate(self, term_ids, num_docs, budget=None):
+        # Integer score accumulators. Without a budget every posting of every
+        # query term is added (term at a time); with one, impact segments of
+        # all terms are taken highest first until ``budget`` postings were
+        # processed, an anytime approximation of the full ranking.
+        accumulators = np.zeros(num_docs, dtype=np.int64)
+        if len(term_ids) == 0:
+            # No query term in the vocabulary: every document scores zero.
+            return accumulators, 0
+
+        terms, counts = np.unique(term_ids, return_counts=True)
+        if budget is None:
+            for term_id, count in zip(terms.tolist(), counts.tolist()):
+                start, end = self.offsets[term_id], self.offsets[term_id + 1]
+                impacts = self.impacts[start:end].astype(np.int64)
+                accumulators[self.doc_ids[start:end]] += count * impacts
+            processed = self.offsets[terms + 1] - self.offsets[terms]
+            return accumulators, int(processed.sum())
+
+        first = np.searchsorted(self.segment_starts, self.offsets[terms])
+        last = np.searchsorted(self.segment_starts, self.offsets[terms + 1])
+        segment_ids = np.concatenate(
+            [np.arange(lo, hi) for lo, hi in zip(first.tolist(), last.tolist())]
+            or [np.zeros(0, dtype=np.int64)]
+        )
+        if len(segment_ids) == 0:
+            return accumulators, 0
+
+        segment_counts = np.repeat(counts, last - first)
+        starts = self.segment_starts[segment_ids]
+        # Segments never cross term boundaries, so each ends where the next
+        # one starts.
+        ends = np.append(self.segment_starts, len(self.impacts))[segment_ids + 1]
+        weights = segment_counts * self.impacts[starts].astype(np.int64)
+
+        # Highest-impact segments first, up to and including the one that
+        # reaches the budget, then all their postings are added at once.
+        order = np.argsort(-weights, kind="stable")
+        lengths = (ends - starts)[order]
+        taken = order[: np.searchsorted(np.cumsum(lengths), budget) + 1]
+
+        lengths = ends[taken] - starts[taken]
+        postings = np.arange(lengths.sum()) + np.repeat(
+            starts[taken] - (np.cumsum(lengths) - lengths), lengths
+        )
+        accumulators += np.bincount(
+            self.doc_ids[postings],
+            weights=np.repeat(weights[taken], lengths),
+            minlength=num_docs,
+        ).astype(np.int64)
+        return accumulators, int(lengths.sum())
+
+    def doc_term_matrix(self, num_docs):
+        # Docs x terms matrix of the integer impacts, for batched scoring.
+        term_doc = csc_matrix(
+            (self.impacts.astype(np.float64), self.doc_ids, self.offsets),
+            shape=(num_docs, len(self.offsets) - 1),
+        )
+        return term_doc.tocsr()
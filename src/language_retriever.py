@@ -1,22 +1,42 @@
 import json
-from collections import Counter
 
 import numpy as np
+from scipy.sparse import csr_matrix, vstack
 
+from .incremental import UpdatableIndex, reads_snapshot
+from .index_store import load_index, save_index
+from .instrumentation import instrumentation
+from .inverted_index import PairIndex
 from .logger import get_logger
-from .utils import tokenizer
+from .tokenized_corpus import as_corpus
+from .utils import boundary_candidates, tokenize_query
 
 logger = get_logger(__name__)
 
 
-class BaseRetriever:
-    def __init__(self, config, mu):
+class BaseRetriever(UpdatableIndex):
+    BACKENDS = ("document", "sparse")
+    MODEL_NAME = None
+    PARAMS = ("mu",)
+    # Constructor options that are not scoring parameters, forwarded whenever
+    # a saved index is loaded in another process.
+    OPTIONS = ("backend",)
+
+    def __init__(self, config, mu, backend="document", result_cache=None):
+        if backend not in self.BACKENDS:
+            msg = f"Unknown backend '{backend}', expected one of {self.BACKENDS}"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        super().__init__(result_cache)
         self.config = config
         self.mu = mu
+        self.backend = backend
 
-        self.doc_lengths = []
-        self.doc_term_freqs = []
+        self.doc_lengths = np.array([], dtype=np.int64)
         self.collection_probs = {}
+        self._query_count_cache = (None, None)
+        self.doc_term_matrix = None
 
     def _load_vocabulary(self):
         logger.debug(f"Loading vocabulary from {self.config.tokens_path}")
@@ -24,97 +44,506 @@ class BaseRetriever:
         with open(self.config.tokens_path, "r") as f:
             vocab = json.load(f)
 
+        self.vocab = vocab
         self.vocab_map = {word: idx for idx, word in enumerate(vocab)}
         logger.debug(f"Loaded {len(vocab)} vocabulary terms")
 
-    def fit(self, passages_df):
+    def fit(self, passages_df, workers: int = 1):
         self._load_vocabulary()
-        total_collection_words = 0
-        collection_counts = Counter()
-
-        for text in passages_df["passage_text"]:
-            tokens = tokenizer(text)
-            self.doc_lengths.append(len(tokens))
-
-            counts = Counter(t for t in tokens if t in self.vocab_map)
-            self.doc_term_freqs.append(counts)
-
-            collection_counts.update(counts)
-            total_collection_words += sum(counts.values())
-
-        for word, count in collection_counts.items():
-            self.collection_probs[word] = count / total_collection_words
+        corpus = as_corpus(passages_df, workers=workers)
+        with instrumentation.timer("index"):
+            self.source_checksum = corpus.checksum
+            self._reset_documents(corpus.doc_ids, len(corpus))
+            self._set_statistics(self._corpus_statistics(corpus))
+
+    def _corpus_statistics(self, corpus):
+        term_ids = corpus.vocab_token_ids(self.vocab_map)
+        doc_idx = corpus.doc_index_per_token()
+        return self._corpus_arrays(term_ids, doc_idx, len(corpus))
+
+    def _corpus_arrays(self, term_ids, doc_idx, num_docs):
+        vocab_size = len(self.vocab_map)
+        in_vocab = term_ids >= 0
+        doc_offsets, columns, tfs = _count_csr(
+            doc_idx[in_vocab], term_ids[in_vocab], num_docs, vocab_size
+        )
+        return {
+            "doc_lengths": np.bincount(doc_idx, minlength=num_docs),
+            "doc_offsets": doc_offsets,
+            "term_ids": columns.astype(np.int32),
+            "tfs": tfs.astype(_count_dtype(tfs)),
+        }
+
+    def get_params(self):
+        return {name: getattr(self, name) for name in self.PARAMS}
+
+    def get_options(self):
+        return {name: getattr(self, name) for name in self.OPTIONS}
+
+    def set_params(self, **params):
+        # Smoothing parameters are applied at query time, so the fitted
+        # collection statistics are reused as they are.
+        for name, value in params.items():
+            if name not in self.PARAMS:
+                msg = f"Unknown parameter '{name}', expected one of {self.PARAMS}"
+                logger.error(msg)
+                raise ValueError(msg)
+            setattr(self, name, value)
+        # Later queries run on a fresh copy with the new parameters.
+        self._snapshot = None
+        return self
+
+    def _index_arrays(self):
+        return {
+            "doc_lengths": np.asarray(self.doc_lengths, dtype=np.int64),
+            "doc_offsets": self.doc_term_matrix.indptr,
+            "term_ids": self.doc_term_matrix.indices,
+            "tfs": self.doc_term_matrix.data,
+            "deleted": self.deleted,
+        }
+
+    def _set_statistics(self, arrays):
+        self.doc_lengths = arrays["doc_lengths"]
+        self.doc_term_matrix = self._term_matrix(arrays)
+        self._refresh_statistics()
+
+    def _term_matrix(self, arrays):
+        return csr_matrix(
+            (arrays["tfs"], arrays["term_ids"], arrays["doc_offsets"]),
+            shape=(len(arrays["doc_lengths"]), len(self.vocab)),
+        )
+
+    def _refresh_statistics(self):
+        # The per-document path reads plain Python numbers, which are much
+        # faster than NumPy scalars one at a time.
+        self._doc_length_vector = np.asarray(self.doc_lengths, dtype=np.float64)
+        self._doc_length_list = self.doc_lengths.tolist()
+        self._query_count_cache = (None, None)
+
+        statistics = self.shared_statistics
+        if statistics is None:
+            statistics = self.collection_statistics()
+        collection_counts = statistics["collection_counts"]
+        self._collection_prob_vector = collection_counts / max(
+            collection_counts.sum(), 1
+        )
+        self.collection_probs = {
+            self.vocab[idx]: self._collection_prob_vector[idx].item()
+            for idx in np.flatnonzero(self._collection_prob_vector)
+        }
+
+    def collection_statistics(self):
+        # Collection probabilities count live documents only.
+        matrix = self.doc_term_matrix
+        if self._has_deletes:
+            matrix = matrix[~self.deleted]
+        return {
+            "collection_counts": np.bincount(
+                matrix.indices, weights=matrix.data, minlength=len(self.vocab)
+            )
+        }
+
+    def _append_corpus(self, corpus):
+        self._append_arrays(self._corpus_statistics(corpus))
+
+    def _append_arrays(self, arrays):
+        matrix = self._term_matrix(arrays)
+        self.doc_lengths = np.concatenate([self.doc_lengths, arrays["doc_lengths"]])
+        self.doc_term_matrix = vstack([self.doc_term_matrix, matrix], format="csr")
+
+    def _compact_rows(self, keep):
+        self.doc_lengths = self.doc_lengths[keep]
+        self.doc_term_matrix = self.doc_term_matrix[keep]
+
+    def save(self, path):
+        header = {
+            "model": self.MODEL_NAME,
+            "params": self.get_params(),
+            "checksum": self.source_checksum,
+            "vocab": self.vocab,
+            "doc_ids": self.doc_ids,
+            "next_doc_id": self.next_doc_id,
+        }
+        save_index(path, header, self._index_arrays())
+
+    @classmethod
+    def load(cls, path, config, passages=None, **options):
+        # ``passages`` (anything ``fit`` accepts) enables the staleness check.
+        header, arrays = load_index(path, cls.MODEL_NAME, passages)
+
+        # Scoring parameters may be overridden; the stored statistics do not
+        # depend on them.
+        retriever = cls(config, **{**header["params"], **options})
+        retriever.vocab = header["vocab"]
+        retriever.vocab_map = {word: idx for idx, word in enumerate(retriever.vocab)}
+        retriever.source_checksum = header["checksum"]
+        retriever._reset_documents(
+            header.get("doc_ids"),
+            len(arrays["doc_lengths"]),
+            arrays.get("deleted"),
+            header.get("next_doc_id"),
+        )
+        retriever._set_statistics(arrays)
+        return retriever
+
+    def _query_term_lists(self, queries):
+        return [
+            [
+                self.vocab_map[t]
+                for t in tokenize_query(query_text)
+                if t in self.vocab_map
+            ]
+            for query_text in queries
+        ]
 
+    def _query_counts(self, query_tokens):
+        # Per-document scoring reads the same query columns for every document,
+        # so they are gathered once per query into nested lists and reused.
+        cached_tokens, counts = self._query_count_cache
+        if cached_tokens != query_tokens:
+            counts = self._gather_query_counts(query_tokens)
+            self._query_count_cache = (list(query_tokens), counts)
+        return counts
+
+    def _gather_query_counts(self, query_tokens):
+        term_ids = [self.vocab_map[word] for word in query_tokens]
+        return self.doc_term_matrix[:, term_ids].toarray().tolist()
+
+    def _smoothed_unigram_probs(self, term_ids, tf=None, doc_indices=None):
+        # Rows follow ``doc_indices`` when given, otherwise every document.
+        matrix, doc_lengths = self.doc_term_matrix, self._doc_length_vector
+        if doc_indices is not None:
+            matrix, doc_lengths = matrix[doc_indices], doc_lengths[doc_indices]
+        if tf is None:
+            tf = matrix[:, term_ids].toarray()
+        p_wc = self._collection_prob_vector[term_ids]
+        return (tf + self.mu * p_wc) / (doc_lengths + self.mu)[:, None]
+
+    @reads_snapshot
     def retrieve_top_k(self, query_text: str, k: int = 5):
-        query_tokens = [t for t in tokenizer(query_text) if t in self.vocab_map]
+        query_tokens = [t for t in tokenize_query(query_text) if t in self.vocab_map]
         if not query_tokens:
             return np.array([])
 
-        scores = [
-            self.calculate_score(query_tokens, i) for i in range(len(self.doc_lengths))
-        ]
-
-        sorted_indices = np.argsort(scores)
-        best_indices_first = sorted_indices[::-1]
-        return best_indices_first[:k]
+        return self._cached_top_k(
+            query_tokens, k, lambda: self._retrieve_top_k(query_tokens, k)
+        )
+
+    def _retrieve_top_k(self, query_tokens, k):
+        with instrumentation.timer("score"):
+            scores = self._query_scores(query_tokens, k)
+        instrumentation.count("queries")
+        instrumentation.count("docs_scored", len(scores))
+
+        return self._rank(scores, k)
+
+    def _query_scores(self, query_tokens, k):
+        if self.backend != "document":
+            return self.calculate_scores(query_tokens)
+        return np.fromiter(
+            (
+                self.calculate_score(query_tokens, i)
+                for i in range(len(self.doc_lengths))
+            ),
+            dtype=np.float64,
+            count=len(self.doc_lengths),
+        )
+
+    def _batch_scores(self, query_term_lists, k):
+        return self.calculate_scores_batch(query_term_lists)
+
+    @reads_snapshot
+    def retrieve_top_k_with_scores(self, query_text: str, k: int = 5):
+        # Rankings of several indexes (e.g. shards) are merged on these scores.
+        query_tokens = [t for t in tokenize_query(query_text) if t in self.vocab_map]
+        if not query_tokens:
+            return np.array([], dtype=np.int64), np.array([])
+
+        scores = self._query_scores(query_tokens, k)
+        top_indices = self._rank(scores, k)
+        return top_indices, scores[top_indices]
+
+    @reads_snapshot
+    def retrieve_top_k_batch(self, queries, k: int = 5):
+        query_term_lists = self._query_term_lists(queries)
+        with instrumentation.timer("score"):
+            scores = self._batch_scores(query_term_lists, k)
+        instrumentation.count("queries", scores.shape[0])
+        instrumentation.count("docs_scored", scores.size)
+        top_indices = self._rank_batch(scores, k)
+
+        # Queries without any vocabulary term get no results, padded with -1.
+        empty_queries = [not term_ids for term_ids in query_term_lists]
+        top_indices[empty_queries] = -1
+        return top_indices
 
     def calculate_score(self, query_tokens, doc_idx):
         raise NotImplementedError("Child class must implement this")
 
+    def calculate_scores(self, query_tokens, doc_indices=None):
+        # Scores of ``doc_indices`` only, in that order, when given.
+        raise NotImplementedError("Child class must implement this")
+
+    def calculate_scores_batch(self, query_term_lists):
+        raise NotImplementedError("Child class must implement this")
+
 
 class UnigramRetriever(BaseRetriever):
+    """Dirichlet-smoothed query likelihood.
+
+    The "logspace" backend scores with the decomposition
+    ``sum log(mu * p_wc) - |q| * log(|d| + mu) + sum log(1 + tf / (mu * p_wc))``:
+    a query-only constant, one vectorized per-document length term and a
+    correction over the postings of matched terms only. There, and in batch
+    scoring with any backend, documents within rounding distance of the k-th
+    score are rescored with the arithmetic of ``calculate_scores``, so rankings
+    (ties included) are the same as single-query retrieval.
+    """
+
+    MODEL_NAME = "unigram"
+    BACKENDS = BaseRetriever.BACKENDS + ("logspace",)
+
+    def _refresh_statistics(self):
+        super()._refresh_statistics()
+        self._log_space = None
+        # Term-major postings of the counts, independent of mu.
+        postings = self.doc_term_matrix.tocsc()
+        postings.sort_indices()
+        posting_terms = np.repeat(
+            np.arange(postings.shape[1]), np.diff(postings.indptr)
+        )
+        self._term_postings = postings
+        # (term, doc) keys in posting order, for exact lookups of a few tf.
+        self._posting_keys = posting_terms * postings.shape[0] + postings.indices
+
+    def _log_space_statistics(self):
+        # Per-term log(mu * p_wc), per-document log(|d| + mu) and the matched
+        # term corrections (docs x terms, CSC); rebuilt when mu changes.
+        log_space = self._log_space
+        if log_space is None or log_space[0] != self.mu:
+            mu_p = self.mu * self._collection_prob_vector
+            postings = self._term_postings
+            corrections = postings.astype(np.float64)
+            posting_terms = np.repeat(
+                np.arange(postings.shape[1]), np.diff(postings.indptr)
+            )
+            with np.errstate(divide="ignore"):
+                log_collection = np.log(mu_p)
+                corrections.data = np.log1p(corrections.data / mu_p[posting_terms])
+
+            log_length = np.log(self._doc_length_vector + self.mu)
+            log_space = (self.mu, log_collection, log_length, corrections)
+            self._log_space = log_space
+        return log_space[1:]
+
+    def _log_space_scores(self, query_tokens):
+        log_collection, log_length, corrections = self._log_space_statistics()
+        terms, counts = np.unique(
+            [self.vocab_map[word] for word in query_tokens], return_counts=True
+        )
+        scores = log_collection[terms] @ counts - len(query_tokens) * log_length
+
+        # Only the postings of the query terms are read.
+        starts = corrections.indptr[terms]
+        lengths = corrections.indptr[terms + 1] - starts
+        postings = np.arange(lengths.sum()) + np.repeat(
+            starts - (np.cumsum(lengths) - lengths), lengths
+        )
+        scores += np.bincount(
+            corrections.indices[postings],
+            weights=np.repeat(counts, lengths) * corrections.data[postings],
+            minlength=len(scores),
+        )
+        return scores
+
+    def _query_scores(self, query_tokens, k):
+        if self.backend != "logspace":
+            return super()._query_scores(query_tokens, k)
+        scores = self._log_space_scores(query_tokens)
+        self._settle_boundary(
+            scores, [self.vocab_map[word] for word in query_tokens], k
+        )
+        return scores
+
+    def _batch_scores(self, query_term_lists, k):
+        # Neither the matrix product nor the decomposition adds terms in the
+        # order of calculate_scores, so every backend settles its top k.
+        scores = self.calculate_scores_batch(query_term_lists)
+        for row, term_ids in zip(scores, query_term_lists):
+            if term_ids:
+                self._settle_boundary(row, term_ids, k)
+        return scores
+
+    def _settle_boundary(self, scores, term_ids, k):
+        # Mathematically tied documents (e.g. matching different terms of equal
+        # collection frequency) may differ in the last bits, and which one the
+        # sparse backend ranks first depends on its own rounding. Rescoring the
+        # documents near the k-th score reproduces it exactly.
+        if self._has_deletes:
+            scores[self.deleted] = -np.inf
+        candidates = boundary_candidates(scores, k)
+        scores[candidates] = self._sparse_scores(term_ids, candidates)
+
+    def _sparse_scores(self, term_ids, docs):
+        # calculate_scores of the sparse backend, restricted to ``docs``.
+        postings = self._term_postings
+        keys = np.add.outer(np.asarray(term_ids) * postings.shape[0], docs)
+        positions = np.searchsorted(self._posting_keys, keys)
+        positions = np.minimum(positions, len(self._posting_keys) - 1)
+        tf = np.where(
+            self._posting_keys[positions] == keys, postings.data[positions], 0
+        )
+        mu_p = self.mu * self._collection_prob_vector[term_ids]
+        denominators = self._doc_length_vector[docs] + self.mu
+        with np.errstate(divide="ignore"):
+            log_probs = np.log((tf + mu_p[:, None]) / denominators)
+
+        scores = np.zeros(len(docs))
+        for row in log_probs:
+            scores += row
+        return scores
+
+    def _log_space_scores_batch(self, query_term_lists):
+        log_collection, log_length, corrections = self._log_space_statistics()
+        unique_terms, query_matrix = _query_term_matrix(query_term_lists)
+        query_lengths = np.asarray(query_matrix.sum(axis=1))
+
+        # Stored query counts only, so a -inf log(mu * p_wc) is never
+        # multiplied by a zero count.
+        constants = query_matrix @ log_collection[unique_terms]
+        matched = query_matrix @ corrections[:, unique_terms].T
+        return constants[:, None] - query_lengths * log_length + matched.toarray()
+
     def calculate_score(self, query_tokens, doc_idx):
         score = 0.0
-        doc_len = self.doc_lengths[doc_idx]
-        doc_counts = self.doc_term_freqs[doc_idx]
+        doc_len = self._doc_length_list[doc_idx]
+        doc_counts = self._query_counts(query_tokens)[doc_idx]
 
-        for word in query_tokens:
+        for word, tf in zip(query_tokens, doc_counts):
             p_wc = self.collection_probs.get(word, 0)
-            numerator = doc_counts[word] + (self.mu * p_wc)
+            numerator = tf + (self.mu * p_wc)
             denominator = doc_len + self.mu
 
             score += np.log(numerator / denominator)
         return score
 
+    def calculate_scores(self, query_tokens, doc_indices=None):
+        if self.backend == "logspace" and doc_indices is None:
+            return self._log_space_scores(query_tokens)
+
+        term_ids = [self.vocab_map[word] for word in query_tokens]
+        with np.errstate(divide="ignore"):
+            log_probs = np.log(
+                self._smoothed_unigram_probs(term_ids, doc_indices=doc_indices)
+            )
+
+        # Accumulate term by term to keep the per-document summation order.
+        scores = np.zeros(len(log_probs))
+        for column in log_probs.T:
+            scores += column
+        return scores
+
+    def calculate_scores_batch(self, query_term_lists):
+        if self.backend == "logspace":
+            return self._log_space_scores_batch(query_term_lists)
+
+        unique_terms, query_matrix = _query_term_matrix(query_term_lists)
+        with np.errstate(divide="ignore"):
+            log_probs = np.log(self._smoothed_unigram_probs(unique_terms))
+
+        # (queries x terms) @ (terms x docs); only stored counts are multiplied,
+        # so a -inf log-probability never meets a zero query count.
+        return np.asarray(query_matrix @ log_probs.T)
+
 
 class BigramRetriever(BaseRetriever):
-    def __init__(self, config, mu, lambda_=0.5):
-        super().__init__(config, mu)
-        self.lambda_ = lambda_
-        self.doc_bigram_freqs = []
+    MODEL_NAME = "bigram"
+    PARAMS = ("mu", "lambda_")
 
-    def fit(self, passages_df):
-        super().fit(passages_df)
-        for text in passages_df["passage_text"]:
-            tokens = tokenizer(text)
-            pairs = []
-            for i in range(len(tokens) - 1):
-                w1 = tokens[i]
-                w2 = tokens[i + 1]
-                if w1 in self.vocab_map and w2 in self.vocab_map:
-                    pairs.append((w1, w2))
+    def __init__(self, config, mu, lambda_=0.5, backend="document", result_cache=None):
+        super().__init__(config, mu, backend, result_cache)
+        self.lambda_ = lambda_
 
-            self.doc_bigram_freqs.append(Counter(pairs))
+    def _corpus_arrays(self, term_ids, doc_idx, num_docs):
+        arrays = super()._corpus_arrays(term_ids, doc_idx, num_docs)
+
+        # Adjacent tokens of the same passage, both in the vocabulary.
+        vocab_size = len(self.vocab_map)
+        is_pair = (
+            (doc_idx[:-1] == doc_idx[1:]) & (term_ids[:-1] >= 0) & (term_ids[1:] >= 0)
+        )
+        pair_keys = term_ids[:-1][is_pair] * vocab_size + term_ids[1:][is_pair]
+        bigram_offsets, keys, counts = _count_csr(
+            doc_idx[:-1][is_pair], pair_keys, num_docs, vocab_size * vocab_size
+        )
+
+        arrays["bigram_offsets"] = bigram_offsets
+        arrays["pair_keys"] = keys
+        arrays["pair_counts"] = counts.astype(_count_dtype(counts))
+        return arrays
+
+    def _index_arrays(self):
+        arrays = super()._index_arrays()
+        arrays["bigram_offsets"] = self.doc_bigram_matrix.indptr
+        arrays["pair_keys"] = self.doc_bigram_matrix.indices
+        arrays["pair_counts"] = self.doc_bigram_matrix.data
+        return arrays
+
+    def _set_statistics(self, arrays):
+        # Set before the base class refreshes statistics, which builds the pair
+        # index from this matrix.
+        self.doc_bigram_matrix = self._pair_matrix(arrays)
+        super()._set_statistics(arrays)
+
+    def _pair_matrix(self, arrays):
+        vocab_size = len(self.vocab)
+        return csr_matrix(
+            (arrays["pair_counts"], arrays["pair_keys"], arrays["bigram_offsets"]),
+            shape=(len(arrays["doc_lengths"]), vocab_size * vocab_size),
+        )
+
+    def _append_arrays(self, arrays):
+        super()._append_arrays(arrays)
+        matrix = self._pair_matrix(arrays)
+        self.doc_bigram_matrix = vstack([self.doc_bigram_matrix, matrix], format="csr")
+
+    def _compact_rows(self, keep):
+        super()._compact_rows(keep)
+        self.doc_bigram_matrix = self.doc_bigram_matrix[keep]
+
+    def _refresh_statistics(self):
+        super()._refresh_statistics()
+        self.pair_index = PairIndex.from_matrix(self.doc_bigram_matrix)
+
+    def _pair_column(self, w1, w2):
+        return self.vocab_map[w1] * len(self.vocab_map) + self.vocab_map[w2]
+
+    def _gather_query_counts(self, query_tokens):
+        pair_columns = [
+            self._pair_column(w_prev, w_curr)
+            for w_prev, w_curr in zip(query_tokens, query_tokens[1:])
+        ]
+        pair_counts = self.doc_bigram_matrix[:, pair_columns].toarray().tolist()
+        return list(zip(super()._gather_query_counts(query_tokens), pair_counts))
 
     def calculate_score(self, query_tokens, doc_idx):
         score = 0.0
-        doc_len = self.doc_lengths[doc_idx]
-        doc_uni = self.doc_term_freqs[doc_idx]
-        doc_bi = self.doc_bigram_freqs[doc_idx]
+        doc_len = self._doc_length_list[doc_idx]
+        doc_uni, doc_bi = self._query_counts(query_tokens)[doc_idx]
 
         w0 = query_tokens[0]
         p_wc = self.collection_probs.get(w0, 0)
-        p_uni_smoothed = (doc_uni[w0] + self.mu * p_wc) / (doc_len + self.mu)
+        p_uni_smoothed = (doc_uni[0] + self.mu * p_wc) / (doc_len + self.mu)
         score += np.log(p_uni_smoothed) if p_uni_smoothed > 0 else -50
 
         for i in range(1, len(query_tokens)):
-            w_prev, w_curr = query_tokens[i - 1], query_tokens[i]
+            w_curr = query_tokens[i]
 
             p_wc = self.collection_probs.get(w_curr, 0)
-            p_uni_smoothed = (doc_uni[w_curr] + self.mu * p_wc) / (doc_len + self.mu)
+            p_uni_smoothed = (doc_uni[i] + self.mu * p_wc) / (doc_len + self.mu)
 
-            count_pair = doc_bi[(w_prev, w_curr)]
-            count_prev = doc_uni[w_prev]
+            count_pair = doc_bi[i - 1]
+            count_prev = doc_uni[i - 1]
             p_bigram_mle = (count_pair / count_prev) if count_prev > 0 else 0
 
             prob = (1 - self.lambda_) * p_bigram_mle + (self.lambda_ * p_uni_smoothed)
@@ -122,3 +551,103 @@ class BigramRetriever(BaseRetriever):
             score += np.log(prob) if prob > 0 else -50
 
         return score
+
+    def calculate_scores(self, query_tokens, doc_indices=None):
+        term_ids = [self.vocab_map[word] for word in query_tokens]
+        log_probs = self._position_log_probs(
+            term_ids, [-1] + term_ids[:-1], doc_indices
+        )
+
+        scores = np.zeros(len(log_probs))
+        for column in log_probs.T:
+            scores += column
+        return scores
+
+    def calculate_scores_batch(self, query_term_lists):
+        # Flatten every query position into one column so the whole batch is
+        # scored with a single set of gathers, then fold positions per query.
+        curr_terms, prev_terms, position_rows = [], [], []
+        for row, term_ids in enumerate(query_term_lists):
+            curr_terms.extend(term_ids)
+            prev_terms.extend(([-1] + term_ids)[: len(term_ids)])
+            position_rows.extend([row] * len(term_ids))
+
+        log_probs = self._position_log_probs(curr_terms, prev_terms)
+        position_matrix = csr_matrix(
+            (np.ones(len(position_rows)), (position_rows, np.arange(len(curr_terms)))),
+            shape=(len(query_term_lists), len(curr_terms)),
+        )
+        return np.asarray(position_matrix @ log_probs.T)
+
+    def _position_log_probs(self, curr_terms, prev_terms, doc_indices=None):
+        # (docs x positions) log-probabilities, rows following ``doc_indices``
+        # when given; ``prev_terms`` is -1 where a position starts its query.
+        # A document without the (prev, curr) pair has a zero bigram MLE, so its
+        # probability is the scaled unigram part; only the pair's postings get
+        # the interpolated bigram term.
+        curr_terms = np.asarray(curr_terms, dtype=np.int64)
+        prev_terms = np.asarray(prev_terms, dtype=np.int64)
+        has_prev = prev_terms >= 0
+
+        unique_terms, term_positions = np.unique(curr_terms, return_inverse=True)
+        matrix = self.doc_term_matrix
+        if doc_indices is not None:
+            matrix = matrix[doc_indices]
+        tf = matrix[:, unique_terms].toarray()
+        p_uni_smoothed = self._smoothed_unigram_probs(unique_terms, tf, doc_indices)[
+            :, term_positions
+        ]
+
+        probs = p_uni_smoothed.copy()
+        probs[:, has_prev] = self.lambda_ * p_uni_smoothed[:, has_prev]
+
+        vocab_size = len(self.vocab_map)
+        prev_positions = np.flatnonzero(has_prev)
+        pair_keys = prev_terms[prev_positions] * vocab_size + curr_terms[prev_positions]
+        if doc_indices is None:
+            key_positions, docs, count_pair = self.pair_index.gather(pair_keys)
+        else:
+            # A handful of documents: slicing their rows beats the postings.
+            pairs = self.doc_bigram_matrix[doc_indices][:, pair_keys].tocoo()
+            key_positions, docs, count_pair = pairs.col, pairs.row, pairs.data
+        positions = prev_positions[key_positions]
+
+        count_prev = tf[docs, np.searchsorted(unique_terms, prev_terms[positions])]
+        p_bigram_mle = count_pair / count_prev
+        probs[docs, positions] = (1 - self.lambda_) * p_bigram_mle + (
+            self.lambda_ * p_uni_smoothed[docs, positions]
+        )
+
+        with np.errstate(divide="ignore"):
+            return np.where(probs > 0, np.log(probs), -50)
+
+
+def _count_csr(rows, columns, num_rows, num_columns):
+    # Sums (row, column) occurrences into CSR offsets, sorted columns and counts.
+    keys, counts = np.unique(rows * num_columns + columns, return_counts=True)
+    offsets = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // num_columns, minlength=num_rows), out=offsets[1:])
+    return offsets, keys % num_columns, counts
+
+
+def _count_dtype(counts):
+    # Smallest unsigned type that holds every count; corpora of short passages
+    # fit in uint16.
+    max_count = counts.max() if len(counts) else 0
+    return np.uint16 if max_count <= np.iinfo(np.uint16).max else np.uint32
+
+
+def _query_term_matrix(query_term_lists):
+    rows, cols = [], []
+    for row, term_ids in enumerate(query_term_lists):
+        rows.extend([row] * len(term_ids))
+        cols.extend(term_ids)
+
+    unique_terms, columns = np.unique(
+        np.asarray(cols, dtype=np.int64), return_inverse=True
+    )
+    query_matrix = csr_matrix(
+        (np.ones(len(cols)), (rows, columns)),
+        shape=(len(query_term_lists), len(unique_terms)),
+    )
+    return unique_terms, query_matrix
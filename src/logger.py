@@ -2,17 +2,35 @@ import datetime
 import logging
 from pathlib import Path
 
-LOG_DIR = Path("logs")
-LOG_DIR.mkdir(parents=True, exist_ok=True)
+LOG_DIR = Path(__file__).resolve().parents[1] / "logs"
+LOG_FORMAT = "[%(asctime)s] %(name)s - %(levelname)s - %(message)s"
 
-LOG_FILE = LOG_DIR / f'{datetime.datetime.now().strftime("%Y-%m-%d")}.log'
 
-logging.basicConfig(
-    filename=LOG_FILE,
-    format="[%(asctime)s] %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
+class _DailyFileHandler(logging.FileHandler):
+    # Opened on the first record rather than at import, so importing a module
+    # never creates the log directory.
+    def __init__(self, log_dir):
+        self.log_dir = Path(log_dir)
+        log_file = self.log_dir / f"{datetime.date.today():%Y-%m-%d}.log"
+        super().__init__(log_file, delay=True)
+
+    def _open(self):
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+def configure_logging(log_dir=LOG_DIR, level=logging.INFO):
+    # A no-op when the application already configured the root logger.
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    handler = _DailyFileHandler(log_dir)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
 
 
 def get_logger(name):
+    # Handlers are set up by the entry points with ``configure_logging``, so
+    # importing a module never touches the filesystem.
     return logging.getLogger(name)
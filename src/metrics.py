@@ -1,10 +1,37 @@
+import logging
+
 import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
 
+from .instrumentation import instrumentation
 from .logger import get_logger
 
 logger = get_logger(__name__)
 
 
+def doc_id_array(passages):
+    # Doc ids may come from a passages DataFrame, a TokenizedCorpus built by the
+    # streaming readers, or a plain sequence of ids.
+    if isinstance(passages, pd.DataFrame):
+        doc_ids = passages["doc_id"]
+    else:
+        doc_ids = getattr(passages, "doc_ids", passages)
+    if doc_ids is None:
+        msg = "Passages carry no doc ids to evaluate against"
+        logger.error(msg)
+        raise ValueError(msg)
+    return np.asarray(doc_ids).astype(str, copy=False)
+
+
+def _search_sorted(sorted_values, values):
+    # Positions of ``values`` in ``sorted_values`` and whether each was found.
+    positions = np.searchsorted(sorted_values, values)
+    found = positions < len(sorted_values)
+    found[found] = sorted_values[positions[found]] == values[found]
+    return positions, found
+
+
 class Evaluator:
     def __init__(self, ground_truth_data):
         logger.info("Initializing Evaluator with ground truth data")
@@ -23,6 +50,18 @@ class Evaluator:
                     query_id, doc_id = row["query_id"], row["doc_id"]
                     self.ground_truth.setdefault(query_id, []).append(doc_id)
 
+            # Duplicate judgments would count twice in the relevant totals.
+            self.ground_truth = {
+                str(query_id): list(dict.fromkeys(map(str, doc_ids)))
+                for query_id, doc_ids in self.ground_truth.items()
+            }
+            self.query_ids = list(self.ground_truth)
+            self.relevant_counts = np.array(
+                [len(self.ground_truth[query_id]) for query_id in self.query_ids],
+                dtype=np.int64,
+            )
+            self._rows = {query_id: row for row, query_id in enumerate(self.query_ids)}
+            self._relevance = None
             logger.info("Ground truth loaded successfully")
 
         except Exception as e:
@@ -34,7 +73,8 @@ class Evaluator:
         top_5_docs = retrieved_doc_ids[:5]
         hits = len(set(top_5_docs) & set(relevant_doc_ids))
         score = hits / 5.0
-        logger.debug(f"P@5 score: {score}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"P@5 score: {score}")
         return score
 
     def calculate_mrr(self, retrieved_doc_ids, relevant_doc_ids):
@@ -42,14 +82,15 @@ class Evaluator:
         for rank, doc_id in enumerate(retrieved_doc_ids):
             if doc_id in relevant_doc_ids:
                 score = 1.0 / (rank + 1)
-                logger.debug(f"MRR score: {score}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"MRR score: {score}")
                 return score
         logger.debug("MRR score: 0.0 (no relevant doc found)")
         return 0.0
 
     def calculate_ap(self, retrieved_doc_ids, relevant_doc_ids):
         logger.debug("Calculating AP")
-        total_relevant_docs = 10
+        total_relevant_docs = len(relevant_doc_ids)
         cumulative_precision = 0.0
         found_relevant = 0
 
@@ -60,47 +101,130 @@ class Evaluator:
                 cumulative_precision += precision_at_rank
 
         score = cumulative_precision / total_relevant_docs
-        logger.debug(f"AP score: {score}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"AP score: {score}")
         return score
 
-    def evaluate_model(self, model, queries_df, passages_df):
-        logger.info("Starting model evaluation")
-        precision_scores, mrr_scores, map_scores = [], [], []
-
-        for _, row in queries_df.iterrows():
-            query_id = str(row["query_id"])
-            query_text = row["query_text"]
-
-            if query_id not in self.ground_truth:
-                continue
+    def relevance_matrix(self, doc_ids):
+        # Rows follow ``self.query_ids``; built once per document collection and
+        # reused for every run evaluated against it.
+        doc_ids = doc_id_array(doc_ids)
+        cached = self._relevance
+        if cached is not None and (
+            cached[0] is doc_ids or np.array_equal(cached[0], doc_ids)
+        ):
+            return cached[1]
+
+        rows = np.repeat(
+            np.arange(len(self.query_ids)),
+            [len(self.ground_truth[query_id]) for query_id in self.query_ids],
+        )
+        relevant = np.array(
+            [
+                doc_id
+                for query_id in self.query_ids
+                for doc_id in self.ground_truth[query_id]
+            ],
+            dtype=str,
+        )
+        order = np.argsort(doc_ids, kind="stable")
+        positions, found = _search_sorted(doc_ids[order], relevant)
+
+        relevance = csr_matrix(
+            (
+                np.ones(int(found.sum()), dtype=bool),
+                (rows[found], order[positions[found]]),
+            ),
+            shape=(len(self.query_ids), len(doc_ids)),
+        )
+        relevance.sum_duplicates()
+        self._relevance = (doc_ids, relevance)
+        return relevance
+
+    def compute_metrics(self, top_indices, relevance, query_rows):
+        """Mean P@k, MRR, MAP, nDCG@k and Recall@k of one or more runs.
+
+        ``top_indices`` has shape (..., num_queries, k), padded with -1, and
+        ``query_rows`` selects the matching rows of ``relevance``. Leading
+        dimensions are kept, so a whole grid of runs is scored in one call.
+        """
+        top_indices = np.asarray(top_indices, dtype=np.int64)
+        k = top_indices.shape[-1]
+        num_docs = relevance.shape[1]
+
+        # A hit is a (query row, doc) pair stored in the relevance matrix; its
+        # sorted CSR keys are searched for every retrieved pair at once.
+        keys = (
+            np.repeat(np.arange(relevance.shape[0]), np.diff(relevance.indptr))
+            * num_docs
+            + relevance.indices
+        )
+        query_keys = top_indices + query_rows[:, None] * num_docs
+        hits = (top_indices >= 0) & _search_sorted(keys, query_keys)[1]
+
+        num_relevant = np.maximum(self.relevant_counts[query_rows], 1)
+        ranks = np.arange(1, k + 1)
+        discounts = 1.0 / np.log2(ranks + 1)
+        ideal_dcg = np.cumsum(discounts)[np.minimum(num_relevant, k) - 1]
+
+        num_hits = hits.sum(axis=-1)
+        precision = np.cumsum(hits, axis=-1) / ranks
+        metrics = {
+            f"P@{k}": num_hits / k,
+            "MRR": (hits / ranks).max(axis=-1),
+            "MAP": (precision * hits).sum(axis=-1) / num_relevant,
+            f"nDCG@{k}": (hits * discounts).sum(axis=-1) / ideal_dcg,
+            f"Recall@{k}": num_hits / num_relevant,
+        }
+        return {name: values.mean(axis=-1) for name, values in metrics.items()}
+
+    def evaluate_runs(self, runs, queries_df, passages):
+        # ``runs`` stacks the top-k matrices of several models or parameter
+        # settings, one row per row of ``queries_df``, e.g. a whole
+        # hyperparameter grid. Queries without judgments are left out.
+        query_ids = queries_df["query_id"].astype(str)
+        judged = query_ids.isin(self._rows).to_numpy()
+        if not judged.any():
+            logger.error("No queries were successfully evaluated!")
+            return None
 
+        with instrumentation.timer("evaluate"):
+            query_rows = np.array(
+                [self._rows[query_id] for query_id in query_ids[judged]]
+            )
+            runs = np.asarray(runs)[..., judged, :]
+            relevance = self.relevance_matrix(passages)
+            metrics = self.compute_metrics(runs, relevance, query_rows)
+        return [
+            {name: round(values[idx].item(), 4) for name, values in metrics.items()}
+            for idx in range(len(runs))
+        ]
+
+    def _retrieve_all(self, model, query_texts, k):
+        if hasattr(model, "retrieve_top_k_batch"):
             try:
-                top_passage_indices = model.retrieve_top_k(query_text, k=5)
-                if len(top_passage_indices) == 0:
-                    continue
-
-                retrieved_doc_ids = (
-                    passages_df.iloc[top_passage_indices]["doc_id"].astype(str).values
-                )
+                return np.asarray(model.retrieve_top_k_batch(query_texts, k=k))
             except Exception as e:
-                logger.error(f"Failed retrieving docs for query_id={query_id}: {e}")
-                continue
+                logger.error(f"Batch retrieval failed, falling back per query: {e}")
 
-            relevant_doc_ids = self.ground_truth[query_id]
-
-            precision_scores.append(
-                self.calculate_p_at_5(retrieved_doc_ids, relevant_doc_ids)
-            )
-            mrr_scores.append(self.calculate_mrr(retrieved_doc_ids, relevant_doc_ids))
-            map_scores.append(self.calculate_ap(retrieved_doc_ids, relevant_doc_ids))
+        # Per-query results are padded into the same (num_queries, k) layout.
+        top_indices = np.full((len(query_texts), k), -1, dtype=np.int64)
+        for row, query_text in enumerate(query_texts):
+            try:
+                indices = np.asarray(model.retrieve_top_k(query_text, k=k), dtype=int)
+                top_indices[row, : len(indices)] = indices[:k]
+            except Exception as e:
+                logger.error(f"Failed retrieving docs for query='{query_text}': {e}")
+        return top_indices
 
-        if not precision_scores:
+    def evaluate_model(self, model, queries_df, passages, k: int = 5):
+        logger.info("Starting model evaluation")
+        queries_df = queries_df[queries_df["query_id"].astype(str).isin(self._rows)]
+        if queries_df.empty:
             logger.error("No queries were successfully evaluated!")
-            return {"P@5": 0, "MRR": 0, "MAP": 0}
+            return {
+                name: 0 for name in (f"P@{k}", "MRR", "MAP", f"nDCG@{k}", f"Recall@{k}")
+            }
 
-        results = {
-            "P@5": round(np.mean(precision_scores).item(), 4),
-            "MRR": round(np.mean(mrr_scores).item(), 4),
-            "MAP": round(np.mean(map_scores).item(), 4),
-        }
-        return results
+        top_indices = self._retrieve_all(model, queries_df["query_text"].tolist(), k)
+        return self.evaluate_runs(top_indices[None], queries_df, passages)[0]
@@ -0,0 +1,42 @@
+import seaborn as sns
+from matplotlib import pyplot as plt
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def plot_results(bm25_results, uni_results, bi_results, output_path):
+    # 1. Setup Theme
+    sns.set_theme(style="whitegrid", context="paper", font_scale=1.3)
+
+    results = {"BM25": bm25_results, "Unigram": uni_results, "Bigram": bi_results}
+    models = list(results.keys())
+
+    metrics_data = [
+        ("MAP", [r["MAP"] for r in results.values()]),
+        ("P@5", [r["P@5"] for r in results.values()]),
+        ("MRR", [r["MRR"] for r in results.values()]),
+    ]
+
+    fig, axes = plt.subplots(
+        1, 3, figsize=(15, 6), constrained_layout=True, sharey=True
+    )
+    for ax, (metric_name, scores) in zip(axes, metrics_data):
+        sns.barplot(
+            x=models, y=scores, ax=ax, palette="viridis", hue=models, legend=False
+        )
+        ax.set_box_aspect(1)
+        ax.set_title(metric_name, fontweight="bold", pad=10)
+        ax.set_ylabel("Score")
+        ax.set_ylim(0, 0.6)
+
+        for container in ax.containers:
+            ax.bar_label(container, fmt="%.3f", padding=3, fontsize=11)
+
+    fig.suptitle("Retriever Performance Comparison", fontsize=18, fontweight="bold")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    plt.savefig(output_path, dpi=300)
+    logger.info(f"Results plot saved to '{output_path}'")
+    print("Plot saved successfully.")
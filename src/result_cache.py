@@ -0,0 +1,114 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from .instrumentation import instrumentation
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ResultCache:
+    """Bounded LRU cache of top-k results with optional time-to-live.
+
+    Keys are built by the retrievers from the normalized query tokens, the
+    model type and parameters, ``k`` and the index version, so a refit or an
+    incremental update never serves results of the previous index.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, ttl=None, clock=None):
+        if max_entries is not None and max_entries <= 0:
+            msg = f"max_entries must be positive, got {max_entries}"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock or time.monotonic
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.num_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        if not config.result_cache_enabled:
+            return None
+        return cls(
+            max_entries=config.result_cache_max_entries,
+            max_bytes=config.result_cache_max_bytes,
+            ttl=config.result_cache_ttl,
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                instrumentation.count("cache_misses")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            instrumentation.count("cache_hits")
+            return entry[0]
+
+    def put(self, key, value):
+        # Cached arrays are shared between callers, so they are made read-only.
+        value.setflags(write=False)
+        size = value.nbytes + sys.getsizeof(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, self.clock())
+            self.num_bytes += size
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.num_bytes = 0
+
+    def info(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.num_bytes,
+        }
+
+    def _expired(self, entry):
+        return self.ttl is not None and self.clock() - entry[2] > self.ttl
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.num_bytes -= size
+
+    def _evict(self):
+        # Least recently used entries go first; with a TTL, expired entries are
+        # dropped from the old end as well.
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self.num_bytes > self.max_bytes)
+            or self._expired(next(iter(self._entries.values())))
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+
+from .instrumentation import instrumentation
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+EXECUTORS = ("thread", "process")
+
+# Per-process retriever for process-pool workers, set once by _init_worker.
+_worker = {}
+
+
+def _init_worker(retriever_cls, index_path, config, options):
+    # Workers memory-map the saved index instead of unpickling a fitted model,
+    # and are built with its options (backend, pruning, impact settings).
+    _worker["model"] = retriever_cls.load(index_path, config, **options)
+
+
+def _worker_retrieve(queries, k):
+    return _worker["model"].retrieve_top_k_batch(queries, k=k)
+
+
+class RetrievalServer:
+    """Serves top-k queries over HTTP, micro-batching concurrent requests.
+
+    Requests arriving within ``batch_window_ms`` of the first queued one (up to
+    ``max_batch_size``) are scored with a single ``retrieve_top_k_batch`` call
+    on a worker pool, so the event loop only parses requests and writes replies.
+    """
+
+    def __init__(
+        self,
+        model,
+        batch_window_ms: float = 5,
+        max_batch_size: int = 64,
+        executor: str = "thread",
+        workers: int = 1,
+        index_path=None,
+        max_body_bytes: int = 65536,
+    ):
+        if executor not in EXECUTORS:
+            msg = f"Unknown executor '{executor}', expected one of {EXECUTORS}"
+            logger.error(msg)
+            raise ValueError(msg)
+        if executor == "process" and index_path is None:
+            msg = "The process executor needs the path of a saved index"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        self.model = model
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.executor = executor
+        self.workers = workers
+        self.index_path = index_path
+        self.max_body_bytes = max_body_bytes
+
+        self.num_requests = 0
+        self.num_batches = 0
+        self._queue = None
+        self._pool = None
+        self._tasks = set()
+        # Open connections (handler task -> writer), closed on shutdown.
+        self._connections = {}
+
+    @classmethod
+    def from_config(cls, model, config, index_path=None):
+        return cls(
+            model,
+            batch_window_ms=config.batch_window_ms,
+            max_batch_size=config.max_batch_size,
+            executor=config.server_executor,
+            workers=config.server_workers,
+            index_path=index_path,
+            max_body_bytes=config.max_body_bytes,
+        )
+
+    async def serve(self, host="127.0.0.1", port=8080, unix_socket=None):
+        self._start()
+        try:
+            if unix_socket:
+                server = await asyncio.start_unix_server(
+                    self._handle_connection, path=str(unix_socket)
+                )
+                address = f"unix:{unix_socket}"
+            else:
+                server = await asyncio.start_server(self._handle_connection, host, port)
+                address = f"http://{host}:{port}"
+
+            logger.info(
+                f"Retrieval server listening | address={address}, "
+                f"window={self.batch_window * 1000:g}ms, "
+                f"max_batch={self.max_batch_size}, "
+                f"executor={self.executor}x{self.workers}"
+            )
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self._stop()
+
+    async def search(self, query_text: str, k: int = 5):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query_text, k, future))
+        return await future
+
+    def _start(self):
+        if self.executor == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(
+                    type(self.model),
+                    self.index_path,
+                    self.model.config,
+                    self.model.get_options(),
+                ),
+            )
+            self._retrieve = _worker_retrieve
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            self._retrieve = self.model.retrieve_top_k_batch
+
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def _stop(self):
+        # Close the open connections first so no handler is left reading from a
+        # closed loop, then the batcher and the batches still in flight.
+        for task, writer in list(self._connections.items()):
+            writer.close()
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+        self._batcher.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(self._batcher, *self._tasks, return_exceptions=True)
+        self._pool.shutdown(cancel_futures=True)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Scoring runs in the pool; the next batch is collected meanwhile.
+            task = asyncio.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch):
+        queries = [query_text for query_text, _, _ in batch]
+        max_k = max(k for _, k, _ in batch)
+        self.num_requests += len(batch)
+        self.num_batches += 1
+
+        try:
+            top_indices = await asyncio.get_running_loop().run_in_executor(
+                self._pool, self._retrieve, queries, max_k
+            )
+        except Exception as e:
+            logger.exception(f"Batch of {len(batch)} queries failed")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # A top-k prefix of the max_k ranking is the top-k ranking; -1 pads
+        # queries with fewer results.
+        for (_, k, future), indices in zip(batch, top_indices):
+            if not future.done():
+                future.set_result([idx for idx in indices[:k].tolist() if idx >= 0])
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                request = await _read_request(reader, self.max_body_bytes)
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                if body is None:
+                    # The body was left unread, so the connection cannot be reused.
+                    status, payload = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {
+                        "error": f"Request body exceeds {self.max_body_bytes} bytes"
+                    }
+                    writer.write(_response(status, payload, keep_alive=False))
+                    await writer.drain()
+                    break
+
+                status, payload = await self._dispatch(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # Server shutdown; ending quietly keeps asyncio from logging the
+            # cancelled handler as an error.
+            pass
+        finally:
+            del self._connections[task]
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {
+                "status": "ok",
+                "model": type(self.model).__name__,
+                "documents": self.model.num_live_docs,
+            }
+        if method == "GET" and path == "/stats":
+            stats = {
+                "requests": self.num_requests,
+                "batches": self.num_batches,
+                "mean_batch_size": self.num_requests / max(self.num_batches, 1),
+            }
+            if instrumentation.enabled:
+                stats["instrumentation"] = instrumentation.report()
+            return HTTPStatus.OK, stats
+        if method == "POST" and path == "/search":
+            return await self._search_endpoint(body)
+        return HTTPStatus.NOT_FOUND, {"error": f"No route for {method} {path}"}
+
+    async def _search_endpoint(self, body):
+        try:
+            request = json.loads(body)
+            query_text = request["query"]
+            k = int(request.get("k", 5))
+            if not isinstance(query_text, str) or k <= 0:
+                raise ValueError("'query' must be a string and 'k' positive")
+        except (ValueError, KeyError, TypeError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": f"Invalid search request: {e}"}
+
+        start = time.perf_counter()
+        try:
+            indices = await self.search(query_text, k)
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+        doc_ids = self.model.doc_ids
+        return HTTPStatus.OK, {
+            "query": query_text,
+            "doc_ids": [doc_ids[idx] for idx in indices],
+            "took_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+
+async def _read_request(reader, max_body_bytes):
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    # A body over the limit is not read; the caller replies 413 instead.
+    length = int(headers.get("content-length", 0))
+    if length > max_body_bytes:
+        return method, path, headers, None
+    body = await reader.readexactly(length)
+    return method, path, headers, body
+
+
+def _response(status, payload, keep_alive=True):
+    body = json.dumps(payload).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
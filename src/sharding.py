@@ -0,0 +1,188 @@
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from .instrumentation import instrumentation
+from .logger import get_logger
+from .tokenized_corpus import as_corpus
+
+logger = get_logger(__name__)
+
+EXECUTORS = ("thread", "process")
+
+# Per-process shard for process-pool workers, set once by _init_worker.
+_worker = {}
+
+
+def _init_worker(retriever_cls, index_path, config, params, statistics):
+    # Each worker memory-maps its saved shard and adopts the global statistics.
+    _worker["model"] = retriever_cls.load(index_path, config, **params)
+    _worker["model"].set_collection_statistics(statistics)
+
+
+def _worker_search(queries, k):
+    return _search_shard(_worker["model"], queries, k)
+
+
+def _search_shard(shard, queries, k):
+    return [shard.retrieve_top_k_with_scores(query_text, k) for query_text in queries]
+
+
+def merge_statistics(statistics):
+    # Shard statistics are plain counts (and count vectors), so the statistics
+    # of the whole collection are their sums.
+    return {name: sum(shard[name] for shard in statistics) for name in statistics[0]}
+
+
+class ShardedRetriever:
+    """Partitions passages into contiguous shards, one fitted retriever each,
+    and answers queries by scatter-gather.
+
+    Every shard scores with the statistics of the whole collection (IDF,
+    average length, collection probabilities), so document scores and merged
+    rankings are the same as a single index over all passages; the impact
+    backend quantizes per shard and is the exception. Shards run on a thread
+    pool or, with ``executor="process"``, each in its own process that loads
+    the shard saved under ``index_dir``. Shards are fitted once; updates are
+    not forwarded.
+    """
+
+    def __init__(
+        self,
+        retriever_cls,
+        config,
+        num_shards: int = 2,
+        executor: str = "thread",
+        index_dir=None,
+        **params,
+    ):
+        if executor not in EXECUTORS:
+            msg = f"Unknown executor '{executor}', expected one of {EXECUTORS}"
+            logger.error(msg)
+            raise ValueError(msg)
+        if num_shards < 1:
+            msg = f"Number of shards must be positive, got {num_shards}"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        self.retriever_cls = retriever_cls
+        self.config = config
+        self.num_shards = num_shards
+        self.executor = executor
+        self.index_dir = index_dir
+        self.params = params
+
+        self.shards = []
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = []
+        self.statistics = None
+        self._pools = None
+        self._temp_dir = None
+
+    def fit(self, passages_df, workers: int = 1):
+        corpus = as_corpus(passages_df, workers=workers)
+        bounds = np.linspace(0, len(corpus), self.num_shards + 1).astype(np.int64)
+
+        self.close()
+        self.shards = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            shard = self.retriever_cls(self.config, **self.params)
+            shard.fit(corpus.slice(start, end))
+            self.shards.append(shard)
+
+        self.offsets = bounds
+        self.doc_ids = [doc_id for shard in self.shards for doc_id in shard.doc_ids]
+        self.statistics = merge_statistics(
+            [shard.collection_statistics() for shard in self.shards]
+        )
+        for shard in self.shards:
+            shard.set_collection_statistics(self.statistics)
+
+        logger.info(
+            f"Sharded index fitted | shards={self.num_shards}, docs={len(corpus)}, "
+            f"executor={self.executor}"
+        )
+        return self
+
+    def _start(self):
+        if self.executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=self.num_shards)
+            self._pools = [(pool, _search_shard, (shard,)) for shard in self.shards]
+            return
+
+        index_dir = self.index_dir
+        if index_dir is None:
+            self._temp_dir = tempfile.TemporaryDirectory(prefix="ir-shards-")
+            index_dir = self._temp_dir.name
+
+        # One single-worker pool per shard pins every shard to its own process.
+        self._pools = []
+        for idx, shard in enumerate(self.shards):
+            shard_path = Path(index_dir) / f"shard_{idx}"
+            shard.save(shard_path)
+            pool = ProcessPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker,
+                initargs=(
+                    self.retriever_cls,
+                    shard_path,
+                    self.config,
+                    self.params,
+                    self.statistics,
+                ),
+            )
+            self._pools.append((pool, _worker_search, ()))
+
+    def close(self):
+        if self._pools is not None:
+            for pool in {pool for pool, _, _ in self._pools}:
+                pool.shutdown()
+            self._pools = None
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _search(self, queries, k):
+        if self._pools is None:
+            self._start()
+
+        with instrumentation.timer("scatter_gather"):
+            futures = [
+                pool.submit(search, *args, queries, k)
+                for pool, search, args in self._pools
+            ]
+            shard_results = [future.result() for future in futures]
+        instrumentation.count("queries", len(queries))
+
+        # Ties rank the higher global index first, as in a single index.
+        merged = []
+        for query_results in zip(*shard_results):
+            indices = np.concatenate(
+                [
+                    offset + np.asarray(top_indices, dtype=np.int64)
+                    for offset, (top_indices, _) in zip(self.offsets, query_results)
+                ]
+            )
+            scores = np.concatenate([scores for _, scores in query_results])
+            order = np.lexsort((-indices, -scores))[:k]
+            merged.append(indices[order])
+        return merged
+
+    def retrieve_top_k(self, query_text: str, k: int = 5):
+        return self._search([query_text], k)[0]
+
+    def retrieve_top_k_batch(self, queries, k: int = 5):
+        queries = list(queries)
+        top_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, indices in enumerate(self._search(queries, k)):
+            top_indices[row, : len(indices)] = indices
+        return top_indices
@@ -0,0 +1,196 @@
+import hashlib
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+import numpy as np
+
+from .index_store import update_checksum
+from .instrumentation import instrumentation
+from .logger import get_logger
+from .utils import tokenize_many
+
+logger = get_logger(__name__)
+
+# Passages per task when tokenizing with a process pool.
+SHARD_SIZE = 2048
+
+
+class TokenizedCorpus:
+    """Passages tokenized once, as one flat int32 array of token ids.
+
+    Document ``d`` spans ``token_ids[offsets[d]:offsets[d + 1]]``. Ids index
+    ``terms`` and are assigned in order of first occurrence, so the corpus
+    keeps every token (not just the retrieval vocabulary). ``doc_ids`` holds the
+    passage ids when the source provided them.
+    """
+
+    def __init__(self, terms, token_ids, offsets, checksum, doc_ids=None):
+        self.terms = terms
+        self.term_map = {term: idx for idx, term in enumerate(terms)}
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.checksum = checksum
+        self.doc_ids = doc_ids
+
+    @classmethod
+    def from_texts(cls, texts, workers: int = 1):
+        digest = hashlib.sha256()
+
+        def checksummed(texts):
+            for text in texts:
+                update_checksum(digest, text)
+                yield text
+
+        with instrumentation.timer("tokenize"):
+            if workers > 1:
+                terms, token_ids, offsets = _tokenize_parallel(
+                    checksummed(texts), workers
+                )
+            else:
+                terms, token_ids, offsets = _tokenize_shard(checksummed(texts))
+        instrumentation.count("docs_tokenized", len(offsets) - 1)
+
+        logger.info(
+            f"Corpus tokenized | docs={len(offsets) - 1}, "
+            f"tokens={len(token_ids)}, unique_terms={len(terms)}, workers={workers}"
+        )
+        return cls(terms, token_ids, offsets, digest.hexdigest())
+
+    @classmethod
+    def from_passages(cls, passages, workers: int = 1):
+        # ``passages`` is any iterable of (doc_id, passage_text) pairs, e.g. the
+        # streaming readers in ingestion; records are consumed one at a time.
+        doc_ids = []
+
+        def texts():
+            for doc_id, text in passages:
+                doc_ids.append(str(doc_id))
+                yield text
+
+        corpus = cls.from_texts(texts(), workers=workers)
+        corpus.doc_ids = doc_ids
+        return corpus
+
+    @classmethod
+    def from_dataframe(cls, passages_df, workers: int = 1):
+        corpus = cls.from_texts(passages_df["passage_text"], workers=workers)
+        if "doc_id" in passages_df:
+            corpus.doc_ids = passages_df["doc_id"].astype(str).tolist()
+        return corpus
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def num_docs(self):
+        return len(self)
+
+    @property
+    def doc_lengths(self):
+        return np.diff(self.offsets)
+
+    def doc_index_per_token(self):
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.doc_lengths)
+
+    def term_counts(self):
+        return np.bincount(self.token_ids, minlength=len(self.terms))
+
+    def vocab_token_ids(self, vocab_map):
+        # Token stream re-expressed in vocabulary ids, with -1 for other terms.
+        lookup = np.array(
+            [vocab_map.get(term, -1) for term in self.terms], dtype=np.int64
+        )
+        return lookup[self.token_ids]
+
+    def slice(self, start, end):
+        # Documents [start, end) as a corpus of their own, sharing ``terms``.
+        offsets = np.asarray(self.offsets[start : end + 1], dtype=np.int64)
+        token_ids = self.token_ids[offsets[0] : offsets[-1]]
+        checksum = hashlib.sha256(
+            f"{self.checksum}[{start}:{end}]".encode("utf-8")
+        ).hexdigest()
+        doc_ids = None if self.doc_ids is None else self.doc_ids[start:end]
+        return TokenizedCorpus(
+            self.terms, token_ids, offsets - offsets[0], checksum, doc_ids
+        )
+
+    def documents(self):
+        for start, end in zip(self.offsets[:-1], self.offsets[1:]):
+            yield [self.terms[idx] for idx in self.token_ids[start:end]]
+
+
+def as_corpus(passages, workers: int = 1):
+    # Accepts a TokenizedCorpus, a passages DataFrame, or any iterable of
+    # (doc_id, passage_text) pairs or of plain passage texts.
+    if isinstance(passages, TokenizedCorpus):
+        return passages
+    # pandas is only loaded by callers that pass DataFrames; a DataFrame
+    # cannot exist before that, so retrievers import without it.
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(passages, pd.DataFrame):
+        return TokenizedCorpus.from_dataframe(passages, workers=workers)
+
+    passages = iter(passages)
+    first = next(passages, None)
+    if first is None:
+        return TokenizedCorpus.from_texts([], workers=workers)
+
+    passages = chain([first], passages)
+    if isinstance(first, str):
+        return TokenizedCorpus.from_texts(passages, workers=workers)
+    return TokenizedCorpus.from_passages(passages, workers=workers)
+
+
+def _tokenize_shard(texts):
+    # Ids are local to the shard, in first-occurrence order.
+    term_map = {}
+    token_ids = array("i")
+    offsets = array("q", [0])
+
+    for tokens in tokenize_many(texts):
+        token_ids.extend(term_map.setdefault(token, len(term_map)) for token in tokens)
+        offsets.append(len(token_ids))
+
+    return (
+        list(term_map),
+        np.frombuffer(token_ids, dtype=np.int32),
+        np.frombuffer(offsets, dtype=np.int64),
+    )
+
+
+def _tokenize_parallel(texts, workers):
+    # Contiguous shards are tokenized by the pool and merged strictly in input
+    # order. Re-numbering each shard's terms through one global map in that
+    # order reproduces the serial first-occurrence ids exactly.
+    term_map = {}
+    id_chunks, length_chunks = [], []
+
+    def merge(shard):
+        terms, token_ids, offsets = shard
+        lookup = np.fromiter(
+            (term_map.setdefault(term, len(term_map)) for term in terms),
+            dtype=np.int32,
+            count=len(terms),
+        )
+        id_chunks.append(lookup[token_ids])
+        length_chunks.append(np.diff(offsets))
+
+    texts = iter(texts)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while shard := list(islice(texts, SHARD_SIZE)):
+            pending.append(pool.submit(_tokenize_shard, shard))
+            # Bound the number of shards in flight to keep memory flat.
+            if len(pending) >= 2 * workers:
+                merge(pending.popleft().result())
+        while pending:
+            merge(pending.popleft().result())
+
+    offsets = np.zeros(sum(map(len, length_chunks)) + 1, dtype=np.int64)
+    if length_chunks:
+        np.cumsum(np.concatenate(length_chunks), out=offsets[1:])
+    token_ids = np.concatenate(id_chunks) if id_chunks else np.array([], dtype=np.int32)
+    return list(term_map), token_ids, offsets
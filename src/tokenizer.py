@@ -0,0 +1,73 @@
+import logging
+import re
+from functools import lru_cache
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class Tokenizer:
+    def __init__(self, stopwords, query_cache_size: int = 0):
+        self.stopwords = frozenset(stopwords)
+        self.query_cache_size = query_cache_size
+
+        # Cached results are tuples so callers can never mutate a shared entry.
+        if query_cache_size > 0:
+            cached = lru_cache(maxsize=query_cache_size)(self._tokenize_tuple)
+        else:
+            cached = self._tokenize_tuple
+        self._cached_tokenize = cached
+
+    def tokenize(self, text: str):
+        if not isinstance(text, str):
+            logger.error(
+                "Tokenizer received a non-string input; returning empty token list."
+            )
+            return []
+
+        stopwords = self.stopwords
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        filtered = [
+            token
+            for token in tokens
+            if token not in stopwords and not token.isnumeric()
+        ]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"Tokenizer processed text | "
+                f"tokens_in={len(tokens)}, "
+                f" tokens_out={len(filtered)}"
+            )
+        return filtered
+
+    __call__ = tokenize
+
+    def _tokenize_tuple(self, text):
+        return tuple(self.tokenize(text))
+
+    def tokenize_query(self, text: str):
+        # Queries repeat far more than passages, so only they go through the cache.
+        if not isinstance(text, str):
+            return self.tokenize(text)
+        return list(self._cached_tokenize(text))
+
+    def tokenize_many(self, texts):
+        findall = TOKEN_PATTERN.findall
+        stopwords = self.stopwords
+        for text in texts:
+            if not isinstance(text, str):
+                yield self.tokenize(text)
+                continue
+            yield [
+                token
+                for token in findall(text.lower())
+                if token not in stopwords and not token.isnumeric()
+            ]
+
+    def cache_info(self):
+        if self.query_cache_size > 0:
+            return self._cached_tokenize.cache_info()
+        return None
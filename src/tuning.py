@@ -0,0 +1,288 @@
+import csv
+import json
+import math
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+
+from .logger import get_logger
+from .metrics import doc_id_array
+
+logger = get_logger(__name__)
+
+# Per-process state for pool workers, set once by _init_worker.
+_worker = {}
+
+
+def _init_worker(
+    retriever_cls, index_path, config, options, evaluator, queries_df, doc_ids
+):
+    # Every worker memory-maps the same saved index, so the fitted statistics are
+    # shared through the page cache instead of being pickled into each task.
+    _worker["model"] = retriever_cls.load(index_path, config, **options)
+    _worker["evaluator"] = evaluator
+    _worker["queries_df"] = queries_df
+    _worker["doc_ids"] = doc_ids
+
+
+def _evaluate_trial(params, query_positions):
+    return _run_trial(
+        _worker["model"],
+        _worker["evaluator"],
+        _worker["queries_df"],
+        _worker["doc_ids"],
+        params,
+        query_positions,
+    )
+
+
+def _run_trial(model, evaluator, queries_df, doc_ids, params, query_positions):
+    start = time.perf_counter()
+    model.set_params(**params)
+    results = evaluator.evaluate_model(model, queries_df.iloc[query_positions], doc_ids)
+    return results, time.perf_counter() - start
+
+
+class HyperparameterTuner:
+    STRATEGIES = ("grid", "random", "halving")
+
+    def __init__(
+        self,
+        model,
+        evaluator,
+        queries_df,
+        passages,
+        workers: int = 1,
+        metric: str = "MAP",
+        trial_log=None,
+        seed: int = 0,
+    ):
+        self.model = model
+        self.evaluator = evaluator
+        self.queries_df = queries_df
+        # Only the doc ids are needed (and shipped to pool workers).
+        self.doc_ids = doc_id_array(passages)
+        self.workers = workers
+        self.metric = metric
+        self.trial_log = Path(trial_log) if trial_log else None
+        self.seed = seed
+        self.trials = []
+
+    @staticmethod
+    def grid(param_space):
+        names = list(param_space)
+        return [dict(zip(names, values)) for values in product(*param_space.values())]
+
+    def sample(self, param_space, num_trials):
+        # Lists are sampled as choices, (low, high) tuples uniformly.
+        rng = random.Random(self.seed)
+        samples = []
+        for _ in range(num_trials):
+            params = {}
+            for name, space in param_space.items():
+                if isinstance(space, tuple):
+                    params[name] = rng.uniform(*space)
+                else:
+                    params[name] = rng.choice(list(space))
+            samples.append(params)
+        return samples
+
+    def search(
+        self,
+        param_space,
+        strategy: str = "grid",
+        num_trials: int = 20,
+        eta: int = 3,
+        min_queries: int = 5,
+        fixed_params=None,
+    ):
+        if strategy not in self.STRATEGIES:
+            msg = (
+                f"Unknown search strategy '{strategy}', "
+                f"expected one of {self.STRATEGIES}"
+            )
+            logger.error(msg)
+            raise ValueError(msg)
+
+        if strategy == "random":
+            candidates = self.sample(param_space, num_trials)
+        else:
+            candidates = self.grid(param_space)
+        candidates = [{**(fixed_params or {}), **params} for params in candidates]
+
+        logger.info(
+            f"Hyperparameter search started | strategy={strategy}, "
+            f"candidates={len(candidates)}, workers={self.workers}"
+        )
+        self.trials = []
+        with self._executor() as run_trials:
+            if strategy == "halving":
+                best = self._successive_halving(
+                    run_trials, candidates, eta, min_queries
+                )
+            else:
+                all_queries = np.arange(len(self.queries_df))
+                best = self._best(run_trials(candidates, all_queries, rung=0))
+
+        self._write_trial_log()
+        logger.info(
+            f"Hyperparameter search finished | best={best['params']}, "
+            f"{self.metric}={best['results'][self.metric]:.4f}"
+        )
+        return best["params"], best["results"]
+
+    def _successive_halving(self, run_trials, candidates, eta, min_queries):
+        # Score every candidate on a small query subsample, keep the best 1/eta,
+        # and grow the subsample by eta until the survivors see every query.
+        num_queries = len(self.queries_df)
+        query_order = np.random.default_rng(self.seed).permutation(num_queries)
+        num_rungs = max(1, math.ceil(math.log(len(candidates), eta)) + 1)
+        sample_size = max(
+            min(min_queries, num_queries),
+            math.ceil(num_queries / eta ** (num_rungs - 1)),
+        )
+
+        rung = 0
+        while True:
+            query_positions = np.sort(query_order[:sample_size])
+            trials = run_trials(candidates, query_positions, rung=rung)
+            if len(candidates) == 1 or sample_size >= num_queries:
+                return self._best(trials)
+
+            ranked = sorted(
+                range(len(trials)),
+                key=lambda i: (-trials[i]["results"][self.metric], i),
+            )
+            keep = max(1, len(candidates) // eta)
+            candidates = [candidates[i] for i in sorted(ranked[:keep])]
+            sample_size = min(num_queries, sample_size * eta)
+            rung += 1
+
+    def _best(self, trials):
+        # Strictly better scores win, so ties keep the earliest candidate.
+        best = trials[0]
+        for trial in trials[1:]:
+            if trial["results"][self.metric] > best["results"][self.metric]:
+                best = trial
+        return best
+
+    def _record(self, params, query_positions, rung, results, seconds):
+        trial = {
+            "trial": len(self.trials),
+            "rung": rung,
+            "params": params,
+            "num_queries": len(query_positions),
+            "results": results,
+            "seconds": round(seconds, 6),
+        }
+        self.trials.append(trial)
+        logger.info(
+            f"Trial {trial['trial']} {params} on {len(query_positions)} queries "
+            f"-> {self.metric}: {results[self.metric]:.4f} ({seconds:.3f}s)"
+        )
+        return trial
+
+    def _executor(self):
+        if self.workers <= 1:
+            return _SerialTrials(self)
+        return _PoolTrials(self)
+
+    def _write_trial_log(self):
+        if self.trial_log is None:
+            return
+
+        self.trial_log.parent.mkdir(parents=True, exist_ok=True)
+        if self.trial_log.suffix == ".csv":
+            rows = [
+                {
+                    "trial": trial["trial"],
+                    "rung": trial["rung"],
+                    **{f"param_{k}": v for k, v in trial["params"].items()},
+                    "num_queries": trial["num_queries"],
+                    **trial["results"],
+                    "seconds": trial["seconds"],
+                }
+                for trial in self.trials
+            ]
+            fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+            with open(self.trial_log, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(self.trial_log, "w", encoding="utf-8") as f:
+                json.dump(self.trials, f, indent=2)
+
+        logger.info(f"Trial log written | path='{self.trial_log}'")
+
+
+class _SerialTrials:
+    def __init__(self, tuner):
+        self.tuner = tuner
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __call__(self, candidates, query_positions, rung):
+        tuner = self.tuner
+        trials = []
+        for params in candidates:
+            results, seconds = _run_trial(
+                tuner.model,
+                tuner.evaluator,
+                tuner.queries_df,
+                tuner.doc_ids,
+                params,
+                query_positions,
+            )
+            trials.append(
+                tuner._record(params, query_positions, rung, results, seconds)
+            )
+        return trials
+
+
+class _PoolTrials:
+    def __init__(self, tuner):
+        self.tuner = tuner
+
+    def __enter__(self):
+        tuner = self.tuner
+        self._index_dir = tempfile.TemporaryDirectory(prefix="ir-tuning-")
+        tuner.model.save(self._index_dir.name)
+        self._pool = ProcessPoolExecutor(
+            max_workers=tuner.workers,
+            initializer=_init_worker,
+            initargs=(
+                type(tuner.model),
+                self._index_dir.name,
+                tuner.model.config,
+                tuner.model.get_options(),
+                tuner.evaluator,
+                tuner.queries_df,
+                tuner.doc_ids,
+            ),
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        self._pool.shutdown()
+        self._index_dir.cleanup()
+        return False
+
+    def __call__(self, candidates, query_positions, rung):
+        futures = [
+            self._pool.submit(_evaluate_trial, params, query_positions)
+            for params in candidates
+        ]
+        return [
+            self.tuner._record(params, query_positions, rung, *future.result())
+            for params, future in zip(candidates, futures)
+        ]
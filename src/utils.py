@@ -1,48 +1,104 @@
 import json
-import re
 from pathlib import Path
 
-import seaborn as sns
-from matplotlib import pyplot as plt
+import numpy as np
 
 from .config_loader import AppConfig
 from .logger import get_logger
+from .tokenizer import Tokenizer
 
 logger = get_logger(__name__)
 
-try:
-    config = AppConfig()
-    stopwords_path = config.stopwords_path
-    stopwords = Path(stopwords_path).read_text(encoding="utf-8").splitlines()
+# Built from the configuration on first use, so importing this module reads no
+# files; ``configure_tokenizer`` installs one for an injected configuration.
+_default_tokenizer = None
+
+
+def load_stopwords(stopwords_path):
+    try:
+        stopwords = Path(stopwords_path).read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        logger.error(f"Stopwords file not found at path: '{stopwords_path}'")
+        raise
 
     logger.info(
         f"Stopwords loaded successfully | source='{stopwords_path}', "
         f"count={len(stopwords)}"
     )
-except FileNotFoundError:
-    logger.error(f"Stopwords file not found at path: '{stopwords_path}'")
-    raise FileNotFoundError
+    return stopwords
 
 
-def tokenizer(text: str):
-    if not isinstance(text, str):
-        logger.error(
-            "Tokenizer received a non-string input; returning empty token list."
-        )
-        return []
-
-    text = text.lower().strip()
-    tokens = re.findall(r"\w+", text)
-
-    filtered = [
-        token for token in tokens if token not in stopwords and not token.isnumeric()
-    ]
-    logger.debug(
-        f"Tokenizer processed text | "
-        f"tokens_in={len(tokens)}, "
-        f" tokens_out={len(filtered)}"
+def configure_tokenizer(config):
+    global _default_tokenizer
+    _default_tokenizer = Tokenizer(
+        load_stopwords(config.stopwords_path),
+        query_cache_size=config.query_cache_size,
     )
-    return filtered
+    return _default_tokenizer
+
+
+def get_tokenizer():
+    if _default_tokenizer is None:
+        return configure_tokenizer(AppConfig())
+    return _default_tokenizer
+
+
+def tokenizer(text: str):
+    return get_tokenizer().tokenize(text)
+
+
+def tokenize_query(text: str):
+    return get_tokenizer().tokenize_query(text)
+
+
+def tokenize_many(texts):
+    return get_tokenizer().tokenize_many(texts)
+
+
+def top_k_indices(scores, k: int):
+    # Ranks by descending score; equal scores rank the higher index first, which
+    # is the order a stable ``np.argsort(scores)[::-1]`` produces.
+    scores = np.asarray(scores)
+    num_docs = len(scores)
+    k = min(k, num_docs)
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+
+    if k < num_docs:
+        kth_score = np.partition(scores, num_docs - k)[num_docs - k]
+        above = np.flatnonzero(scores > kth_score)
+        tied = np.flatnonzero(scores == kth_score)
+        candidates = np.concatenate([above, tied[len(tied) - (k - len(above)) :]])
+    else:
+        candidates = np.arange(num_docs)
+
+    order = np.lexsort((-candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def boundary_candidates(scores, k: int):
+    # Indices scoring within rounding distance of the k-th best (every finite
+    # score when the k-th is -inf): the documents whose top-k membership and
+    # order can change when the same scores are summed in another order.
+    scores = np.asarray(scores)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+
+    kth_score = np.partition(scores, len(scores) - k)[len(scores) - k]
+    if not np.isfinite(kth_score):
+        return np.flatnonzero(np.isfinite(scores))
+    margin = 1e-9 * (1 + abs(kth_score))
+    return np.flatnonzero(scores >= kth_score - margin)
+
+
+def top_k_indices_batch(scores, k: int):
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    top_indices = np.empty((scores.shape[0], k), dtype=np.int64)
+    for row, row_scores in enumerate(scores):
+        top_indices[row] = top_k_indices(row_scores, k)
+    return top_indices
 
 
 def parse_judgments(file_path: str):
@@ -57,37 +113,3 @@ def parse_judgments(file_path: str):
         logger.error(f"Invalid JSON in judgments file '{file_path}': {e}")
         raise
     return data
-
-
-def plot_results(bm25_results, uni_results, bi_results):
-    # 1. Setup Theme
-    sns.set_theme(style="whitegrid", context="paper", font_scale=1.3)
-
-    results = {"BM25": bm25_results, "Unigram": uni_results, "Bigram": bi_results}
-    models = list(results.keys())
-
-    metrics_data = [
-        ("MAP", [r["MAP"] for r in results.values()]),
-        ("P@5", [r["P@5"] for r in results.values()]),
-        ("MRR", [r["MRR"] for r in results.values()]),
-    ]
-
-    fig, axes = plt.subplots(
-        1, 3, figsize=(15, 6), constrained_layout=True, sharey=True
-    )
-    for ax, (metric_name, scores) in zip(axes, metrics_data):
-        sns.barplot(
-            x=models, y=scores, ax=ax, palette="viridis", hue=models, legend=False
-        )
-        ax.set_box_aspect(1)
-        ax.set_title(metric_name, fontweight="bold", pad=10)
-        ax.set_ylabel("Score")
-        ax.set_ylim(0, 0.6)
-
-        for container in ax.containers:
-            ax.bar_label(container, fmt="%.3f", padding=3, fontsize=11)
-
-    fig.suptitle("Retriever Performance Comparison", fontsize=18, fontweight="bold")
-
-    plt.savefig(config.results_plot, dpi=300)
-    print("Plot saved successfully.")
@@ -1,11 +1,11 @@
 import json
-from collections import Counter
 
+import numpy as np
 import pandas as pd
 
 from .config_loader import AppConfig
 from .logger import get_logger
-from .utils import tokenizer
+from .tokenized_corpus import TokenizedCorpus
 
 logger = get_logger(__name__)
 
@@ -15,25 +15,27 @@ class VocabularyBuilder:
         self.tokens_path = config.tokens_path
         self.vocab_size = config.vocab_size
 
-    def build(self, train_passages: pd.DataFrame):
-        if train_passages is None or "passage_text" not in train_passages:
+    def build(self, train_passages, workers: int = 1):
+        if isinstance(train_passages, TokenizedCorpus):
+            corpus = train_passages
+        elif train_passages is None or "passage_text" not in train_passages:
             msg = "Training passages must contain a 'passage_text' column."
             logger.error(msg)
             raise pd.errors.EmptyDataError(msg)
+        else:
+            corpus = TokenizedCorpus.from_dataframe(train_passages, workers=workers)
 
         logger.info("Vocabulary construction started")
 
-        all_tokens = []
-        for passage in train_passages["passage_text"]:
-            all_tokens.extend(tokenizer(passage))
-
-        counts = Counter(all_tokens)
-
-        self._tokens = [word for word, _ in counts.most_common(self.vocab_size)]
+        # Corpus term ids follow first occurrence, so a stable sort on the counts
+        # breaks ties exactly like Counter.most_common did.
+        counts = corpus.term_counts()
+        top_ids = np.argsort(-counts, kind="stable")[: self.vocab_size]
+        self._tokens = [corpus.terms[idx] for idx in top_ids]
 
         logger.info(
             f"Vocabulary construction completed | "
-            f"unique_tokens={len(counts)}, "
+            f"unique_tokens={len(corpus.terms)}, "
             f"selected_top={len(self._tokens)}"
         )
 
@@ -46,6 +48,7 @@ class VocabularyBuilder:
             raise RuntimeError(msg)
 
         # Save tokens
+        self.tokens_path.parent.mkdir(parents=True, exist_ok=True)
         with open(self.tokens_path, "w", encoding="utf-8") as file:
             json.dump(self._tokens, file, ensure_ascii=False, indent=2)
 
@@ -0,0 +1,8 @@
+import pytest
+
+from src.config_loader import AppConfig
+
+
+@pytest.fixture(scope="session")
+def config():
+    return AppConfig()
@@ -0,0 +1,117 @@
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.bm25_retriever import BM25Retriever
+from src.ingestion import iter_passages
+from src.language_retriever import BigramRetriever, UnigramRetriever
+
+RETRIEVERS = [
+    (BM25Retriever, {"backend": "postings"}),
+    (BM25Retriever, {"backend": "sparse"}),
+    (BM25Retriever, {"pruning": True}),
+    (UnigramRetriever, {"mu": 2000}),
+    (UnigramRetriever, {"mu": 2000, "backend": "sparse"}),
+    (BigramRetriever, {"mu": 2000, "lambda_": 0.7}),
+    (BigramRetriever, {"mu": 2000, "lambda_": 0.7, "backend": "sparse"}),
+]
+IDS = [f"{cls.__name__}-{options}" for cls, options in RETRIEVERS]
+
+
+@pytest.fixture(scope="module")
+def passages(config):
+    return list(islice(iter_passages(config.test_passages_path), 300))
+
+
+@pytest.fixture(scope="module")
+def queries(config):
+    return pd.read_json(config.test_questions_path)["query_text"].tolist()[:15]
+
+
+def assert_same_rankings(model, reference, queries, k=10):
+    assert model.doc_ids == reference.doc_ids
+    for query_text in queries:
+        indices, scores = model.retrieve_top_k_with_scores(query_text, k=k)
+        expected_indices, expected_scores = reference.retrieve_top_k_with_scores(
+            query_text, k=k
+        )
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-9, atol=1e-12)
+        assert [model.doc_ids[idx] for idx in indices] == [
+            reference.doc_ids[idx] for idx in expected_indices
+        ]
+        np.testing.assert_array_equal(
+            model.retrieve_top_k(query_text, k=k),
+            reference.retrieve_top_k(query_text, k=k),
+        )
+
+
+@pytest.mark.parametrize("retriever_cls, options", RETRIEVERS, ids=IDS)
+def test_add_delete_compact_matches_refit(
+    config, passages, queries, retriever_cls, options
+):
+    model = retriever_cls(config, **options)
+    model.fit(passages[:150])
+    model.add_documents(passages[150:250])
+    deleted = [doc_id for doc_id, _ in passages[:250:7]]
+    model.delete_documents(deleted)
+    # Re-adding a live id replaces the old copy, which moves to the end.
+    replaced = passages[20:22]
+    model.add_documents(replaced)
+    model.add_documents(passages[250:])
+
+    replaced_ids = {doc_id for doc_id, _ in replaced}
+    live = [
+        passage
+        for passage in passages[:250]
+        if passage[0] not in deleted and passage[0] not in replaced_ids
+    ]
+    live += replaced + passages[250:]
+
+    model.compact()
+    assert model.num_live_docs == len(live)
+    reference = retriever_cls(config, **options)
+    reference.fit(live)
+    assert_same_rankings(model, reference, queries)
+
+
+@pytest.mark.parametrize("retriever_cls, options", RETRIEVERS, ids=IDS)
+def test_deletes_before_compaction_match_refit(
+    config, passages, queries, retriever_cls, options
+):
+    model = retriever_cls(config, **options)
+    model.fit(passages)
+    deleted = {doc_id for doc_id, _ in passages[::10]}
+    model.delete_documents(sorted(deleted))
+    assert model.num_live_docs == len(passages) - len(deleted)
+
+    reference = retriever_cls(config, **options)
+    reference.fit([passage for passage in passages if passage[0] not in deleted])
+    for query_text in queries:
+        top_ids = [model.doc_ids[idx] for idx in model.retrieve_top_k(query_text, 10)]
+        expected = reference.retrieve_top_k(query_text, 10)
+        assert top_ids == [reference.doc_ids[idx] for idx in expected]
+
+
+def test_delete_unknown_document_raises(config, passages):
+    model = BM25Retriever(config)
+    model.fit(passages[:10])
+    with pytest.raises(ValueError):
+        model.delete_documents(["no-such-doc"])
+
+
+@pytest.mark.parametrize("retriever_cls, options", RETRIEVERS[:1] + RETRIEVERS[3:4])
+def test_generated_ids_are_not_reused(config, tmp_path, retriever_cls, options):
+    model = retriever_cls(config, **options)
+    model.fit([f"passage number {idx} about paris" for idx in range(20)])
+    model.delete_documents([str(idx) for idx in range(15, 20)])
+    model.compact()
+    model.add_documents(["a new passage about france"])
+    assert model.doc_ids[-1] == "20"
+    assert len(set(model.doc_ids)) == len(model.doc_ids)
+
+    model.save(tmp_path / "index")
+    loaded = retriever_cls.load(tmp_path / "index", config)
+    loaded.add_documents(["another passage"])
+    assert loaded.doc_ids[-1] == "21"
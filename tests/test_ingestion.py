@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from src.ingestion import iter_json_array, iter_jsonl
+
+RECORDS = [
+    {"doc_id": 1, "passage_text": "plain text"},
+    {"doc_id": "2", "passage_text": 'quoted "[not] an array", with {braces}'},
+    {"doc_id": 3, "passage_text": 'escapes \\" \\\\ \\] \\n and unicode é ✓'},
+    {"doc_id": 4, "passage_text": "", "extra": [1, [2, 3], {"a": "]"}]},
+    123,
+    "a string, with a comma]",
+    [],
+    {},
+    None,
+    True,
+    -1.5e3,
+]
+
+
+@pytest.fixture
+def array_path(tmp_path):
+    path = tmp_path / "records.json"
+    path.write_text(json.dumps(RECORDS, indent=2, ensure_ascii=False), "utf-8")
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 16])
+def test_json_array_matches_json_load(array_path, chunk_size):
+    with open(array_path, encoding="utf-8") as f:
+        expected = json.load(f)
+    assert list(iter_json_array(array_path, chunk_size=chunk_size)) == expected
+
+
+@pytest.mark.parametrize("text", ["[]", " [ ] ", "[1]", "[ 123 , 4 ]", '["]"]'])
+def test_json_array_small_documents(tmp_path, text):
+    path = tmp_path / "small.json"
+    path.write_text(text, "utf-8")
+    for chunk_size in (1, 2, 5):
+        assert list(iter_json_array(path, chunk_size=chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize("text", ["", "{}", "[1, 2", "[1 2]", "[1,]", '["open]'])
+def test_json_array_rejects_invalid_documents(tmp_path, text):
+    path = tmp_path / "invalid.json"
+    path.write_text(text, "utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(path, chunk_size=2))
+
+
+def test_jsonl_matches_json_loads(tmp_path):
+    path = tmp_path / "records.jsonl"
+    lines = [json.dumps(record, ensure_ascii=False) for record in RECORDS]
+    path.write_text("\n".join(lines[:3] + [""] + lines[3:]) + "\n", "utf-8")
+    assert list(iter_jsonl(path)) == RECORDS
+
+
+def test_jsonl_rejects_invalid_line(tmp_path):
+    path = tmp_path / "invalid.jsonl"
+    path.write_text('{"doc_id": 1}\n{"doc_id": \n', "utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_jsonl(path))